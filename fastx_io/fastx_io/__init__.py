@@ -0,0 +1,101 @@
+"""
+Shared FASTA/FASTQ reading and writing for the tools in this repository.
+
+Files are read as bytes in cache-sized blocks, gzip is detected from the file's
+magic number rather than its name, and records are cut out of each block with
+bytes methods instead of line-by-line text reads:
+
+  read_chunks(path)         file contents, inflating gzip input on a read-ahead
+                            thread (BGZF blocks on several threads at once)
+  fastq_blocks(path)        bytes blocks holding only whole 4-line records
+  iter_fastq_batches(path)  a list of (header, sequence, plus, quality) per block
+  iter_fastq(path)          one (header, sequence, plus, quality) record at a time
+  iter_fasta(path)          (name, sequence) per FASTA record
+  open_fastx(path)          binary file handle, decompressing gzip input
+  compress_bgzf(data)       BGZF blocks for writing, which concatenate into one file
+  BgzfWriter(path)          file writer producing BGZF, compressed on a thread pool
+  read_indexed_fasta(path)  FASTA records as views of an mmap, through a samtools-style
+                            .fai index (load_fasta_index), for sampling windows
+  format_fastq_windows(...) Illumina-style FASTQ records for windows of a sequence,
+                            built as NumPy arrays
+  format_fastq_chunks(...)  the same for (start, end, chunk) tuples already sliced
+  FastqIndex(path)          FASTQ records by read name, through a sidecar index
+                            (byte offsets, or BGZF virtual offsets) built on first use
+
+Record fields are bytes without line endings; decode them only where text is needed.
+"""
+
+from ._bgzf import (
+    BGZF_BLOCK_SIZE,
+    BGZF_EOF,
+    BgzfWriter,
+    compress_bgzf,
+    compress_bgzf_block,
+    inflate_bgzf_raw,
+    is_bgzf,
+    iter_bgzf_blocks,
+    read_bgzf_block,
+    read_bgzf_raw,
+)
+from ._faidx import (
+    FaiRecord,
+    IndexedSequence,
+    build_fasta_index,
+    load_fasta_index,
+    read_fasta_index,
+    read_indexed_fasta,
+    write_fasta_index,
+)
+from ._format import format_fastq_chunks, format_fastq_windows
+from ._index import INDEX_SUFFIX, FastqIndex, build_fastq_index, name_hash
+from ._reader import (
+    BLOCK_SIZE,
+    INFLATE_THREADS,
+    fastq_blocks,
+    is_gzipped,
+    iter_fasta,
+    iter_fastq,
+    iter_fastq_batches,
+    open_fastx,
+    read_chunks,
+    read_name,
+    split_fastq_block,
+)
+
+__version__ = '0.1.0'
+__all__ = [
+    'BGZF_BLOCK_SIZE',
+    'BGZF_EOF',
+    'BLOCK_SIZE',
+    'BgzfWriter',
+    'FaiRecord',
+    'FastqIndex',
+    'INDEX_SUFFIX',
+    'INFLATE_THREADS',
+    'IndexedSequence',
+    'build_fasta_index',
+    'build_fastq_index',
+    'compress_bgzf',
+    'compress_bgzf_block',
+    'fastq_blocks',
+    'format_fastq_chunks',
+    'format_fastq_windows',
+    'inflate_bgzf_raw',
+    'is_bgzf',
+    'is_gzipped',
+    'iter_bgzf_blocks',
+    'iter_fasta',
+    'iter_fastq',
+    'iter_fastq_batches',
+    'load_fasta_index',
+    'name_hash',
+    'open_fastx',
+    'read_bgzf_block',
+    'read_bgzf_raw',
+    'read_chunks',
+    'read_fasta_index',
+    'read_indexed_fasta',
+    'read_name',
+    'split_fastq_block',
+    'write_fasta_index',
+]
@@ -0,0 +1,151 @@
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Largest uncompressed payload per BGZF block (same as htslib), so a block always fits in 64 KB
+BGZF_BLOCK_SIZE = 0xff00
+
+# Empty block that marks the end of a BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def compress_bgzf_block(data, compression_level=6):
+    """Compress data into one BGZF block: a gzip member with a 'BC' extra field holding its size."""
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    block_size = 18 + len(compressed) + 8  # header + deflate data + CRC32/ISIZE trailer
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, block_size - 1)
+    return header + compressed + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def compress_bgzf(data, compression_level=6):
+    """Compress data into a run of BGZF blocks, without the end-of-file marker.
+    
+    Runs compressed separately (for example in different processes) can be
+    concatenated in order, followed by one BGZF_EOF, to make a single BGZF file.
+    """
+    view = memoryview(data)
+    return b''.join(compress_bgzf_block(view[i:i + BGZF_BLOCK_SIZE], compression_level)
+                    for i in range(0, len(data), BGZF_BLOCK_SIZE))
+
+
+class BgzfWriter:
+    """Binary file writer that produces BGZF, compressing blocks on a thread pool.
+
+    BGZF (as written by bgzip/htslib) is a series of independent gzip members, so
+    the output is still ordinary gzip to any reader. Blocks are written in order,
+    with at most four per thread waiting to be compressed.
+    """
+
+    def __init__(self, filename, compression_level=6, threads=1):
+        self.fileobj = open(filename, 'wb')
+        self.compression_level = compression_level
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.max_pending = threads * 4
+        self.pending = deque()
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= BGZF_BLOCK_SIZE:
+            self._submit(bytes(self.buffer[:BGZF_BLOCK_SIZE]))
+            del self.buffer[:BGZF_BLOCK_SIZE]
+        return len(data)
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(compress_bgzf_block, block, self.compression_level))
+        if len(self.pending) >= self.max_pending:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.fileobj.closed:
+            return
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self.fileobj.write(self.pending.popleft().result())
+        self.fileobj.write(BGZF_EOF)
+        self.fileobj.close()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _bgzf_block_size(header, extra):
+    """Total size of a BGZF block from its gzip header and extra field, or None if it has no 'BC' subfield."""
+    if header[:4] != b'\x1f\x8b\x08\x04':
+        return None
+    pos = 0
+    while pos + 4 <= len(extra):
+        subfield, length = extra[pos:pos + 2], struct.unpack_from('<H', extra, pos + 2)[0]
+        if subfield == b'BC' and length == 2:
+            return struct.unpack_from('<H', extra, pos + 4)[0] + 1
+        pos += 4 + length
+    return None
+
+
+def is_bgzf(path):
+    """Check if a file is BGZF: gzip whose first member records its size in a 'BC' extra field."""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12:
+            return False
+        extra = f.read(struct.unpack_from('<H', header, 10)[0])
+        return _bgzf_block_size(header, extra) is not None
+
+
+def read_bgzf_raw(f):
+    """Read the BGZF block at the current position of binary file f without inflating it.
+
+    Returns (raw deflate data, CRC32, uncompressed size), or None at the end of the
+    file. Raises ValueError, leaving f where it was, if the data there is not a BGZF block.
+    """
+    start = f.tell()
+    header = f.read(12)
+    if not header:
+        return None
+    extra = f.read(struct.unpack_from('<H', header, 10)[0]) if len(header) == 12 else b''
+    block_size = _bgzf_block_size(header, extra)
+    if block_size is None:
+        f.seek(start)
+        raise ValueError(f"{getattr(f, 'name', 'input')} is not BGZF at offset {start}")
+    rest = f.read(block_size - 12 - len(extra))
+    if len(rest) != block_size - 12 - len(extra):
+        raise EOFError(f"{getattr(f, 'name', 'input')} ends in the middle of a BGZF block")
+    crc, size = struct.unpack_from('<II', rest, len(rest) - 8)
+    return rest[:-8], crc, size
+
+
+def inflate_bgzf_raw(compressed, crc, size):
+    """Inflate a block from read_bgzf_raw, checking it against its CRC32 and size."""
+    data = zlib.decompress(compressed, -15)
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise zlib.error("BGZF block does not match its CRC32 or size")
+    return data
+
+
+def read_bgzf_block(f):
+    """Read and inflate the BGZF block at the current position of binary file f.
+
+    Returns the block's uncompressed data, or None at the end of the file. Raises
+    ValueError if the data there is not a BGZF block.
+    """
+    raw = read_bgzf_raw(f)
+    return None if raw is None else zlib.decompress(raw[0], -15)
+
+
+def iter_bgzf_blocks(f):
+    """Yield (compressed offset, uncompressed data) for each BGZF block of binary file f, from where it is."""
+    while True:
+        offset = f.tell()
+        data = read_bgzf_block(f)
+        if data is None:
+            return
+        yield offset, data
@@ -0,0 +1,183 @@
+import mmap
+import os
+from collections import namedtuple
+
+from ._reader import is_gzipped
+
+# One line of a samtools-compatible .fai index:
+# name, sequence length, byte offset of first base, bases per line, bytes per line
+FaiRecord = namedtuple('FaiRecord', ['name', 'length', 'offset', 'linebases', 'linewidth'])
+
+
+def _check_not_gzipped(filepath):
+    """Raise ValueError for gzip input, whose bytes can't be read by offset."""
+    if is_gzipped(filepath):
+        raise ValueError(f"{filepath} is gzipped, so its sequences can't be read by offset")
+
+
+def build_fasta_index(filepath):
+    """Scan a FASTA file and return a list of FaiRecord entries (same layout as samtools faidx).
+
+    Raises ValueError if the file is gzipped, or if a record has uneven line lengths,
+    since it could not be indexed.
+    """
+    _check_not_gzipped(filepath)
+    records = []
+    name = None
+
+    with open(filepath, 'rb') as f:
+        position = 0
+        for line in f:
+            if line.startswith(b'>'):
+                if name is not None:
+                    records.append(FaiRecord(name, length, offset, linebases, linewidth))
+                header = line[1:].split(None, 1)
+                name = header[0].decode() if header else ''
+                offset = position + len(line)
+                length = 0
+                linebases = linewidth = 0
+                last_line_short = False
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if bases > 0 and last_line_short:
+                    raise ValueError(f"Different line length in sequence '{name}' of {filepath}")
+                if linebases == 0:
+                    linebases = bases
+                    # A single unterminated line still gets a newline-sized line width
+                    linewidth = len(line) if len(line) > bases else bases + 1
+                elif bases > linebases:
+                    raise ValueError(f"Different line length in sequence '{name}' of {filepath}")
+                last_line_short = bases < linebases
+                length += bases
+            position += len(line)
+
+        # Don't forget the last sequence
+        if name is not None:
+            records.append(FaiRecord(name, length, offset, linebases, linewidth))
+
+    return records
+
+
+def write_fasta_index(fai_path, records):
+    """Write FaiRecord entries to a .fai file."""
+    with open(fai_path, 'w') as f:
+        for record in records:
+            f.write('\t'.join(str(field) for field in record) + '\n')
+
+
+def read_fasta_index(fai_path):
+    """Read a samtools-compatible .fai file into a list of FaiRecord entries."""
+    records = []
+    with open(fai_path, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            records.append(FaiRecord(fields[0], *(int(field) for field in fields[1:5])))
+    return records
+
+
+def load_fasta_index(filepath, save=True):
+    """Reuse filepath.fai if it is up to date, otherwise build the index.
+
+    A built index is saved alongside the FASTA if save is True and the location is
+    writable. Gzipped files raise ValueError without an index being read or written.
+    """
+    _check_not_gzipped(filepath)
+    fai_path = f"{filepath}.fai"
+    if os.path.exists(fai_path) and os.path.getmtime(fai_path) >= os.path.getmtime(filepath):
+        return read_fasta_index(fai_path)
+
+    records = build_fasta_index(filepath)
+    if save:
+        try:
+            write_fasta_index(fai_path, records)
+        except OSError:
+            pass  # Read-only location; the index just won't be reused next time
+    return records
+
+
+# Read-only mmaps of indexed FASTA files, shared by every IndexedSequence in this process
+_mapped_fastas = {}
+
+
+def map_fasta(filepath):
+    """Return a read-only mmap of a FASTA file, opening it once per process."""
+    if filepath not in _mapped_fastas:
+        with open(filepath, 'rb') as f:
+            _mapped_fastas[filepath] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _mapped_fastas[filepath]
+
+
+class IndexedSequence:
+    """Read-only view of one FASTA record in a memory-mapped file.
+
+    Supports len() and slicing like a string, but only the requested window is
+    ever read from disk, with line breaks removed. Pickling sends only the file
+    path and index record, so worker processes map the file themselves.
+    """
+
+    def __init__(self, filepath, record):
+        self.filepath = filepath
+        self.record = record
+        self.mapped_file = map_fasta(filepath)
+
+    def __getstate__(self):
+        return self.filepath, self.record
+
+    def __setstate__(self, state):
+        self.filepath, self.record = state
+        self.mapped_file = map_fasta(self.filepath)
+
+    def __len__(self):
+        return self.record.length
+
+    def _file_position(self, pos):
+        record = self.record
+        return record.offset + (pos // record.linebases) * record.linewidth + pos % record.linebases
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("IndexedSequence only supports slicing")
+        start, stop, step = key.indices(self.record.length)
+        if step != 1:
+            raise ValueError("IndexedSequence only supports contiguous slices")
+        if start >= stop:
+            return ''
+
+        window = self.mapped_file[self._file_position(start):self._file_position(stop - 1) + 1]
+        return window.replace(b'\n', b'').replace(b'\r', b'').decode()
+
+
+def _header_line(mapped_file, record):
+    """Return a record's whole header line after '>' (the .fai only keeps its first word)."""
+    line_start = mapped_file.rfind(b'\n', 0, max(record.offset - 1, 0)) + 1
+    line = mapped_file[line_start:record.offset]
+    if not line.startswith(b'>'):
+        return record.name  # The index doesn't match the file; go by its name
+    return line[1:].rstrip().decode()
+
+
+def read_indexed_fasta(filepath, records=None):
+    """Yield (header, IndexedSequence) for each record using a .fai index and mmap.
+
+    The header is the whole header line, as iter_fasta gives it, so reads are named
+    the same whichever way the file is read. Nothing is loaded up front, so this is
+    suited to sampling windows from very large references. records defaults to
+    load_fasta_index(filepath).
+    """
+    if records is None:
+        records = load_fasta_index(filepath)
+    if not records:
+        return  # An empty file can't be mmapped
+
+    mapped_file = map_fasta(filepath)
+    try:
+        for record in records:
+            if not record.name:
+                continue
+            # Empty records have nothing to map
+            yield _header_line(mapped_file, record), IndexedSequence(filepath, record) if record.length else ''
+    finally:
+        # Sequences still in use keep the mmap open; it closes once they are all gone
+        _mapped_fastas.pop(filepath, None)
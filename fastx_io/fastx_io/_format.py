@@ -0,0 +1,147 @@
+from operator import itemgetter
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+except ImportError:
+    np = None  # Only format_fastq_windows and format_fastq_chunks need NumPy
+
+# Powers of ten used to count the digits of coordinates and tile numbers
+_POWERS_OF_TEN = [10 ** k for k in range(1, 19)]
+
+
+def _fill_digits(out, column, values, width):
+    """Write values as zero-padded decimal digits into out[:, column:column + width].
+
+    The digits are worked out in a small contiguous array, one row per digit position,
+    and copied into the records in one go rather than one strided column at a time.
+    """
+    digits = np.empty((width, len(values)), dtype=np.uint8)
+    if len(values) and values.max() < 1 << 32:
+        values = values.astype(np.uint32)  # Dividing 32-bit integers is faster
+    for k in range(width - 1, -1, -1):
+        values, digits[k] = np.divmod(values, 10)
+    digits += ord('0')
+    out[:, column:column + width] = digits.T
+
+
+def format_fastq_windows(segment, offset, starts, chunk_size, header_prefix, header_suffix, comment_prefix,
+                         separator=b'-', first_tile=1):
+    """Format the windows of a sequence at starts as Illumina-style FASTQ bytes using NumPy.
+
+    Each record is, with tiles numbered from first_tile and end = start + chunk_size - 1:
+
+        {header_prefix}{tile:04}:{start:05}:{end:05}{header_suffix}{window}
+        {comment_prefix}{start}{separator}{end}
+        {chunk_size quality 'I's}
+
+    where header_suffix ends with its newline. segment is a str holding the sequence
+    from position offset, or an IndexedSequence. The segment is held as a uint8 array
+    and all windows are taken as one zero-copy as_strided view. Records whose numbers
+    have the same digit counts share a layout, so each run of them is filled in as a
+    single 2-D array and written out in one go.
+    """
+    num_windows = len(starts)
+    if num_windows == 0:
+        return b''
+    if isinstance(starts, range):
+        starts = np.arange(starts.start, starts.stop, starts.step, dtype=np.int64)
+    else:
+        starts = np.asarray(starts, dtype=np.int64)
+    ends = starts + chunk_size - 1
+    tiles = np.arange(first_tile, first_tile + num_windows, dtype=np.int64)
+
+    if isinstance(segment, str):
+        bases = np.frombuffer(segment.encode(), dtype=np.uint8)
+        relative_starts = starts - offset
+        steps = np.unique(np.diff(relative_starts))
+        if len(steps) <= 1:
+            # Evenly spaced windows (sliding mode) are a strided view of the segment itself
+            step = int(steps[0]) if len(steps) else 1
+            windows = as_strided(bases[relative_starts[0]:], shape=(num_windows, chunk_size),
+                                 strides=(step, 1), writeable=False)
+        else:
+            # Otherwise view every possible window and pick out the sampled ones
+            all_windows = as_strided(bases, shape=(len(bases) - chunk_size + 1, chunk_size),
+                                     strides=(1, 1), writeable=False)
+            windows = all_windows[relative_starts]
+    else:
+        # Indexed sequences are read window by window from the mmap
+        chunks = b''.join(segment[start - offset:start - offset + chunk_size].encode() for start in starts.tolist())
+        windows = np.frombuffer(chunks, dtype=np.uint8).reshape(num_windows, chunk_size)
+
+    return _format_records(windows, tiles, starts, ends, chunk_size, header_prefix, header_suffix,
+                           comment_prefix, separator)
+
+
+def format_fastq_chunks(chunks, header_prefix, header_suffix, comment_prefix, separator=b'-', first_tile=1):
+    """Format (start, end, chunk) tuples as FASTQ bytes using NumPy, in the layout of format_fastq_windows.
+
+    x, y and the comment coordinates are each tuple's own start and end. The chunks
+    (str or bytes) must be ASCII and all the same length, so they can be stacked into
+    one array; otherwise ValueError is raised and the caller formats them another way.
+    """
+    if not chunks:
+        return b''
+    sequences = list(map(itemgetter(2), chunks))
+    chunk_size = len(sequences[0])
+    if len(set(map(len, sequences))) > 1:
+        raise ValueError("Chunks of different lengths can't be formatted as one array")
+    if isinstance(sequences[0], str):
+        joined = ''.join(sequences).encode('ascii')  # UnicodeEncodeError is a ValueError
+    else:
+        joined = b''.join(sequences)
+        if not joined.isascii():
+            raise ValueError("Chunks must be ASCII to be formatted as one array")
+    windows = np.frombuffer(joined, dtype=np.uint8).reshape(len(sequences), chunk_size)
+    starts = np.fromiter(map(itemgetter(0), chunks), dtype=np.int64, count=len(chunks))
+    ends = np.fromiter(map(itemgetter(1), chunks), dtype=np.int64, count=len(chunks))
+    tiles = np.arange(first_tile, first_tile + len(sequences), dtype=np.int64)
+    return _format_records(windows, tiles, starts, ends, chunk_size, header_prefix, header_suffix,
+                           comment_prefix, separator)
+
+
+def _format_records(windows, tiles, starts, ends, chunk_size, header_prefix, header_suffix, comment_prefix,
+                    separator):
+    """Fill in FASTQ records for the rows of windows, one 2-D array per run of equal digit counts."""
+    num_windows = len(windows)
+
+    # Split the batch into runs whose tile, start and end numbers have the same digit counts
+    # (tiles are padded to 4 digits, so only longer ones count)
+    tile_digits = np.maximum(np.searchsorted(_POWERS_OF_TEN, tiles, side='right') + 1, 4)
+    start_digits = np.searchsorted(_POWERS_OF_TEN, starts, side='right') + 1
+    end_digits = np.searchsorted(_POWERS_OF_TEN, ends, side='right') + 1
+    digit_key = (tile_digits * 100 + start_digits) * 100 + end_digits
+    run_bounds = np.concatenate(([0], np.flatnonzero(np.diff(digit_key)) + 1, [num_windows]))
+
+    blocks = []
+    for run_start, run_end in zip(run_bounds[:-1], run_bounds[1:]):
+        tile_width = int(tile_digits[run_start])
+        start_width = int(start_digits[run_start])
+        end_width = int(end_digits[run_start])
+
+        # Lay out one record, noting where the variable fields go
+        layout = [header_prefix, ('tile', tile_width), b":", ('x', max(5, start_width)), b":",
+                  ('y', max(5, end_width)), header_suffix, ('sequence', chunk_size), b"\n",
+                  comment_prefix, ('start', start_width), separator, ('end', end_width), b"\n",
+                  b"I" * chunk_size, b"\n"]
+        template = bytearray()
+        columns = {}
+        for part in layout:
+            if isinstance(part, bytes):
+                template += part
+            else:
+                name, width = part
+                columns[name] = (len(template), width)
+                template += b"0" * width
+
+        out = np.empty((run_end - run_start, len(template)), dtype=np.uint8)
+        out[:] = np.frombuffer(bytes(template), dtype=np.uint8)
+        for name, values in [('tile', tiles), ('x', starts), ('y', ends), ('start', starts), ('end', ends)]:
+            column, width = columns[name]
+            _fill_digits(out, column, values[run_start:run_end], width)
+        column, width = columns['sequence']
+        out[:, column:column + width] = windows[run_start:run_end]
+        blocks.append(out.tobytes())
+
+    return b''.join(blocks)
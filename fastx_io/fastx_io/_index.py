@@ -0,0 +1,200 @@
+import hashlib
+import os
+import struct
+import sys
+from array import array
+
+from ._bgzf import is_bgzf, iter_bgzf_blocks, read_bgzf_block
+from ._reader import BLOCK_SIZE, is_gzipped, read_name
+
+# Sidecar index files sit next to the FASTQ file with this added to its name
+INDEX_SUFFIX = '.fxi'
+
+# Magic, source file size and mtime_ns, record count, hash bucket bits, BGZF flag
+_INDEX_HEADER = struct.Struct('<4sQQQBB')
+_INDEX_MAGIC = b'FXI1'
+
+
+def name_hash(name):
+    """64-bit hash of a read name (bytes), the same in every run unlike hash()."""
+    return int.from_bytes(hashlib.blake2b(name, digest_size=8).digest(), 'little')
+
+
+def _file_blocks(f, bgzf):
+    """Yield (offset, data) through a file: BGZF blocks by compressed offset, or plain BLOCK_SIZE reads."""
+    if bgzf:
+        yield from iter_bgzf_blocks(f)
+        return
+    while True:
+        offset = f.tell()
+        data = f.read(BLOCK_SIZE)
+        if not data:
+            return
+        yield offset, data
+
+
+def _fastq_record_starts(path, bgzf):
+    """Yield (header line, offset) for each record of a FASTQ file.
+
+    Offsets are byte offsets into a plain file, or BGZF virtual offsets (block
+    offset << 16 | offset within the block) into a BGZF one.
+    """
+    line = 0
+    at_line_start = True
+    header = None
+    start = None
+    with open(path, 'rb') as f:
+        for block_offset, data in _file_blocks(f, bgzf):
+            pos = 0
+            while pos < len(data):
+                if at_line_start and line % 4 == 0:
+                    start = (block_offset << 16) | pos if bgzf else block_offset + pos
+                    header = []
+                end = data.find(b'\n', pos)
+                if end < 0:
+                    # The line goes on in the next block
+                    if header is not None:
+                        header.append(data[pos:])
+                    at_line_start = False
+                    break
+                if header is not None:
+                    header.append(data[pos:end])
+                    yield b''.join(header), start
+                    header = None
+                line += 1
+                pos = end + 1
+                at_line_start = True
+    if header:
+        yield b''.join(header), start
+
+
+def build_fastq_index(path, index_path=None):
+    """Write a sidecar index of a FASTQ file's records by read name, returning the index's path.
+
+    The index is a hash table on disk: 64-bit read name hashes sorted into buckets by
+    their top bits, each with the record's offset. Plain files are indexed by byte
+    offset and BGZF files by virtual offset; other gzip files can't be read from the
+    middle, so they raise ValueError.
+    """
+    index_path = index_path or path + INDEX_SUFFIX
+    bgzf = is_bgzf(path)
+    if not bgzf and is_gzipped(path):
+        raise ValueError(f"{path} is gzip but not BGZF, so its records can't be read by offset "
+                         f"(recompress it with bgzip to index it)")
+
+    hashes = array('Q')
+    offsets = array('Q')
+    for header, offset in _fastq_record_starts(path, bgzf):
+        if not header.strip():
+            continue  # Trailing blank lines
+        if not header.startswith(b'@'):
+            raise ValueError(f"{path} is not a FASTQ file: a record does not start with '@'")
+        hashes.append(name_hash(read_name(header)))
+        offsets.append(offset)
+
+    # Counting sort by the top bits of the hash, about one record per bucket
+    bits = max(len(hashes).bit_length(), 1)
+    shift = 64 - bits
+    starts = array('Q', bytes(8 * ((1 << bits) + 1)))
+    for h in hashes:
+        starts[(h >> shift) + 1] += 1
+    for bucket in range(1 << bits):
+        starts[bucket + 1] += starts[bucket]
+    fill = array('Q', starts)
+    sorted_hashes = array('Q', bytes(8 * len(hashes)))
+    sorted_offsets = array('Q', bytes(8 * len(hashes)))
+    for h, offset in zip(hashes, offsets):
+        bucket = h >> shift
+        sorted_hashes[fill[bucket]] = h
+        sorted_offsets[fill[bucket]] = offset
+        fill[bucket] += 1
+
+    stat = os.stat(path)
+    with open(index_path, 'wb') as f:
+        f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(hashes), bits, bgzf))
+        for values in (starts, sorted_hashes, sorted_offsets):
+            if sys.byteorder != 'little':
+                values.byteswap()
+            values.tofile(f)
+    return index_path
+
+
+class FastqIndex:
+    """Random access to the records of a FASTQ file by read name, through its sidecar index.
+
+    The index (path + INDEX_SUFFIX unless given) is built if it is missing or older
+    than the file, unless build is False, when that raises FileNotFoundError. Records
+    come back as (header, sequence, plus, quality) bytes, like iter_fastq's.
+    """
+
+    def __init__(self, path, index_path=None, build=True):
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        if not self._load():
+            if not build:
+                raise FileNotFoundError(f"No up-to-date index for {path} at {self.index_path}")
+            build_fastq_index(path, self.index_path)
+            self._load()
+        self._file = open(path, 'rb')
+
+    def _load(self):
+        """Read the index if it exists and matches the file, returning whether it did."""
+        if not os.path.exists(self.index_path):
+            return False
+        stat = os.stat(self.path)
+        with open(self.index_path, 'rb') as f:
+            magic, size, mtime_ns, count, bits, bgzf = _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+            if magic != _INDEX_MAGIC or (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                return False
+            self.starts, self.hashes, self.offsets = array('Q'), array('Q'), array('Q')
+            self.starts.fromfile(f, (1 << bits) + 1)
+            self.hashes.fromfile(f, count)
+            self.offsets.fromfile(f, count)
+        if sys.byteorder != 'little':
+            for values in (self.starts, self.hashes, self.offsets):
+                values.byteswap()
+        self._shift = 64 - bits
+        self.bgzf = bool(bgzf)
+        return True
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def record_at(self, offset):
+        """Read the record that starts at an offset from the index."""
+        f = self._file
+        if self.bgzf:
+            f.seek(offset >> 16)
+            data = read_bgzf_block(f)[offset & 0xffff:]
+            read_more = lambda: read_bgzf_block(f)
+        else:
+            f.seek(offset)
+            data = f.read(1024)
+            read_more = lambda: f.read(BLOCK_SIZE)
+        while data.count(b'\n') < 4:
+            more = read_more()
+            if not more:
+                break
+            data += more
+        lines = data.replace(b'\r', b'').split(b'\n', 4)[:4]
+        return tuple(lines)
+
+    def get(self, name):
+        """Return the record with this read name (bytes), or None if the file has none."""
+        h = name_hash(name)
+        bucket = h >> self._shift
+        for i in range(self.starts[bucket], self.starts[bucket + 1]):
+            if self.hashes[i] == h:
+                record = self.record_at(self.offsets[i])
+                if read_name(record[0]) == name:
+                    return record
+        return None
@@ -0,0 +1,314 @@
+import gzip
+import os
+import queue
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ._bgzf import inflate_bgzf_raw, is_bgzf, read_bgzf_raw
+
+# Bytes read from the file at a time. Blocks that fit in the CPU cache split
+# faster than large ones
+BLOCK_SIZE = 1 << 16
+
+# First two bytes of every gzip (and BGZF) file
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Threads inflating gzip input. zlib releases the GIL while it inflates, so they
+# run alongside each other and the parser in the calling thread
+INFLATE_THREADS = min(4, os.cpu_count() or 1)
+
+# BGZF blocks handed to an inflating thread at a time (about 1 MB compressed)
+BGZF_BATCH = 16
+
+# Inflated chunks a read-ahead thread keeps ready for the parser
+READ_AHEAD_CHUNKS = 64
+
+# Characters removed from FASTA sequence lines
+_WHITESPACE = b' \t\r\n\v\f'
+
+
+def is_gzipped(path):
+    """Check if a file is gzipped by reading its magic number."""
+    with open(path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def open_fastx(path):
+    """Open a FASTA/FASTQ file for reading bytes, decompressing it if it is gzipped."""
+    if is_gzipped(path):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_chunks(path, block_size=BLOCK_SIZE, threads=INFLATE_THREADS):
+    """Yield the contents of a file (plain or gzipped) as bytes chunks of no particular size.
+
+    Gzip input is inflated with zlib directly, which is faster than reading through
+    gzip.open, and may hold several members. Inflating happens off the calling
+    thread so it overlaps with parsing: BGZF blocks are inflated in parallel on a
+    pool of threads, and other gzip, which can only be inflated in order, on one
+    read-ahead thread. With threads=0 everything runs in the calling thread.
+    """
+    with open(path, 'rb') as f:
+        gzipped = f.read(2) == GZIP_MAGIC
+        if not gzipped:
+            f.seek(0)
+            yield from iter(lambda: f.read(block_size), b'')
+            return
+    if not threads:
+        with open(path, 'rb') as f:
+            yield from _inflate_gzip(path, f, block_size)
+    elif is_bgzf(path):
+        yield from _inflate_bgzf(path, block_size, threads)
+    else:
+        yield from _read_ahead(_inflate_gzip_file(path, block_size))
+
+
+def _inflate_gzip(path, f, block_size):
+    """Yield the inflated contents of the gzip members from the current position of f."""
+    inflater = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    in_member = False
+    for compressed in iter(lambda: f.read(block_size), b''):
+        while compressed:
+            in_member = True
+            chunk = inflater.decompress(compressed)
+            if chunk:
+                yield chunk
+            if inflater.eof:
+                # Start on the next gzip member
+                compressed = inflater.unused_data
+                inflater = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                in_member = False
+            else:
+                compressed = b''
+    if in_member:
+        raise EOFError(f"{path} ends before the end of its gzip stream")
+
+
+def _inflate_gzip_file(path, block_size):
+    """Yield the inflated contents of a gzip file."""
+    with open(path, 'rb') as f:
+        yield from _inflate_gzip(path, f, block_size)
+
+
+def _read_ahead(chunks, depth=READ_AHEAD_CHUNKS):
+    """Yield from an iterator of chunks that is run on a background thread, up to depth chunks ahead.
+
+    An exception in the background thread is raised here, after the chunks before it.
+    """
+    ready = queue.Queue(depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        """Queue an item for the consumer, returning False if it has gone away."""
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+        finally:
+            chunks.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _bgzf_batches(f):
+    """Yield lists of up to BGZF_BATCH raw blocks (from read_bgzf_raw) from the current position of f.
+
+    Stops at the end of the file, or at a gzip member that isn't BGZF, leaving f there.
+    """
+    batch = []
+    while True:
+        try:
+            raw = read_bgzf_raw(f)
+        except ValueError:
+            raw = None
+        if raw is None:
+            break
+        batch.append(raw)
+        if len(batch) == BGZF_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _inflate_bgzf_batch(batch):
+    """Inflate a list of raw BGZF blocks, returning their non-empty contents."""
+    return [data for data in (inflate_bgzf_raw(*raw) for raw in batch) if data]
+
+
+def _inflate_bgzf(path, block_size, threads):
+    """Yield the inflated contents of a BGZF file in order, inflating batches of blocks on threads.
+
+    Only the raw blocks are read in the calling thread; each batch is checked against
+    its CRC32s on the pool. About 2 * threads batches are in flight at once. Anything
+    after the BGZF blocks (such as a plain gzip member appended) is inflated in order.
+    """
+    with open(path, 'rb') as f, ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque()
+        try:
+            for batch in _bgzf_batches(f):
+                pending.append(pool.submit(_inflate_bgzf_batch, batch))
+                if len(pending) > 2 * threads:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Only left over if the caller stopped early or something failed
+            for future in pending:
+                future.cancel()
+        yield from _inflate_gzip(path, f, block_size)
+
+
+def read_name(header):
+    """Return the read name from a FASTQ header: the first word after '@'."""
+    words = header[1:].split(None, 1)
+    return words[0] if words else b''
+
+
+def fastq_blocks(path, block_size=BLOCK_SIZE):
+    """Yield bytes blocks of about block_size holding only whole 4-line FASTQ records.
+
+    Every block ends with a newline. Windows line endings are removed, and trailing
+    blank lines and a missing final newline are tolerated.
+    """
+    chunks = read_chunks(path, block_size)
+    leftover = b''
+    data = next(chunks, b'')
+    while data:
+        following = next(chunks, b'')
+        block = leftover + data
+        if b'\r' in block:
+            block = block.replace(b'\r', b'')
+
+        if not following:
+            block = block.rstrip(b'\n')
+            if not block:
+                return
+            block += b'\n'
+            if block.count(b'\n') % 4:
+                raise ValueError(f"{path} ends with an incomplete FASTQ record")
+        else:
+            # Cut after the last newline that ends a whole record, keeping the rest for the next block
+            cut = len(block)
+            for _ in range(block.count(b'\n') % 4 + 1):
+                cut = block.rfind(b'\n', 0, cut)
+                if cut < 0:
+                    break
+            if cut < 0:
+                leftover, data = block, following
+                continue
+            block, leftover = block[:cut + 1], block[cut + 1:]
+
+        if not block.startswith(b'@'):
+            raise ValueError(f"{path} is not a FASTQ file: a record does not start with '@'")
+        yield block
+        data = following
+
+
+def split_fastq_block(block):
+    """Split a block from fastq_blocks into (header, sequence, plus, quality) tuples.
+
+    Fields are bytes without line endings; header and plus keep their '@' and '+'.
+    """
+    lines = block.split(b'\n')
+    # The block ends with a newline, so the last element is empty
+    return list(zip(lines[0:-1:4], lines[1::4], lines[2::4], lines[3::4]))
+
+
+def iter_fastq_batches(path, block_size=BLOCK_SIZE):
+    """Yield a list of (header, sequence, plus, quality) records per block of a FASTQ file."""
+    for block in fastq_blocks(path, block_size):
+        yield split_fastq_block(block)
+
+
+def iter_fastq(path, block_size=BLOCK_SIZE):
+    """Yield each (header, sequence, plus, quality) record of a FASTQ file (plain or gzipped)."""
+    for batch in iter_fastq_batches(path, block_size):
+        yield from batch
+
+
+def iter_fasta(path, block_size=BLOCK_SIZE):
+    """Yield (name, sequence) bytes for each record of a FASTA file (plain or gzipped).
+
+    The name is the header line after '>'. Line breaks and other whitespace are
+    removed from the sequence, which is gathered block by block, so wrapped and
+    unwrapped sequences cost the same. Lines before the first header are ignored.
+    """
+    name = None
+    pieces = []
+
+    def consume(block):
+        """Add the whole lines in block to the records, yielding each record it completes."""
+        nonlocal name, pieces
+        pos = 0
+        while pos < len(block):
+            if block.startswith(b'>', pos):
+                end_of_line = block.find(b'\n', pos)
+                if name is not None:
+                    yield name, b''.join(pieces)
+                name, pieces = block[pos + 1:end_of_line].rstrip(), []
+                pos = end_of_line + 1
+                continue
+            next_header = block.find(b'\n>', pos)
+            stop = len(block) if next_header < 0 else next_header + 1
+            if name is not None:
+                pieces.append(block[pos:stop].translate(None, _WHITESPACE))
+            pos = stop
+
+    tail = b''           # Partial line held back so a header is never split
+    mid_line = False     # Whether the next chunk continues a sequence line
+    for data in read_chunks(path, block_size):
+        if mid_line:
+            end_of_line = data.find(b'\n')
+            if end_of_line < 0:
+                pieces.append(data.translate(None, _WHITESPACE))
+                continue
+            pieces.append(data[:end_of_line].translate(None, _WHITESPACE))
+            data = data[end_of_line + 1:]
+            mid_line = False
+            if not data:
+                continue
+
+        block = tail + data
+        cut = block.rfind(b'\n') + 1
+        if cut == 0 and not block.startswith(b'>'):
+            # Part of a long sequence line: take it now rather than holding it back
+            if name is not None:
+                pieces.append(block.translate(None, _WHITESPACE))
+            tail, mid_line = b'', True
+            continue
+        block, tail = block[:cut], block[cut:]
+        yield from consume(block)
+
+    if tail:
+        yield from consume(tail + b'\n')
+    if name is not None:
+        yield name, b''.join(pieces)
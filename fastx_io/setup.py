@@ -0,0 +1,23 @@
+from setuptools import setup, find_packages
+
+setup(
+    name="fastx-io",
+    version="0.1.0",
+    description="Fast bytes-level FASTA/FASTQ reading shared by the scripting_with_claude tools",
+    author="Your Name",
+    author_email="your.email@example.com",
+    url="https://github.com/IvoryC/scripting_with_claude",
+    packages=find_packages(),
+    extras_require={'numpy': ['numpy']},
+    zip_safe=False,
+    classifiers=[
+        'Development Status :: 3 - Alpha',
+        'Intended Audience :: Science/Research',
+        'Topic :: Scientific/Engineering :: Bio-Informatics',
+        'License :: OSI Approved :: BSD License',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+    ],
+    python_requires='>=3.8',
+)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark random start sampling in genome-chop.py against the old list-based sampler.
+
+The old sampler built list(range(seq_len - chunk_size + 1)) before calling random.sample,
+so its time and memory grew with the sequence length. sample_random_starts samples from
+the range object directly, so it only pays for the positions it draws.
+"""
+
+import argparse
+import importlib.util
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / "script" / "genome-chop.py"
+
+
+def load_genome_chop():
+    """Import genome-chop.py as a module (its name has a hyphen, so it can't be imported directly)."""
+    spec = importlib.util.spec_from_file_location("genome_chop", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def list_random_starts(seq_len, chunk_size, max_sequences):
+    """The sampler chop_sequence used before, which materialises every valid start position."""
+    valid_starts = list(range(seq_len - chunk_size + 1))
+    if len(valid_starts) == 0:
+        return []
+    random_starts = random.sample(valid_starts, min(max_sequences, len(valid_starts)))
+    if max_sequences > len(valid_starts):
+        random_starts.extend(random.choices(valid_starts, k=max_sequences - len(valid_starts)))
+    random_starts.sort()
+    return random_starts
+
+
+def measure(sampler, seq_len, chunk_size, max_sequences, seed):
+    """Return (seconds, peak bytes, starts) for one call of sampler."""
+    random.seed(seed)
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    starts = sampler(seq_len, chunk_size, max_sequences)
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, starts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark random start sampling in genome-chop.py")
+    parser.add_argument("-l", "--seq-lengths", type=int, nargs="+", default=[1_000_000, 10_000_000, 50_000_000],
+                        help="Sequence lengths to benchmark (default: 1M 10M 50M)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=150, help="Chunk size (default: 150)")
+    parser.add_argument("-n", "--max-sequences", type=int, default=500, help="Starts to draw (default: 500)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    args = parser.parse_args()
+
+    genome_chop = load_genome_chop()
+
+    print("seq_len\tsampler\tseconds\tpeak_MB")
+    for seq_len in args.seq_lengths:
+        results = {}
+        for name, sampler in [("list", list_random_starts), ("range", genome_chop.sample_random_starts)]:
+            elapsed, peak, starts = measure(sampler, seq_len, args.chunk_size, args.max_sequences, args.seed)
+            results[name] = starts
+            print(f"{seq_len}\t{name}\t{elapsed:.6f}\t{peak / 1e6:.3f}")
+
+        # Both samplers must draw exactly the same positions for the same seed
+        if results["list"] != results["range"]:
+            raise SystemExit(f"Samplers disagree for seq_len={seq_len}")
+
+
+if __name__ == "__main__":
+    main()
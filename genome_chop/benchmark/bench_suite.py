@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for genome-chop.py and the q2-genome-chop plugin's _methods.
+
+Synthetic references from 1 Mb up to 1 Gb are generated once and cached. Each case
+(target, reference size, slide, gzip) runs in its own process, so its peak RSS is
+its own. Reading, chopping and writing are timed separately:
+
+  script  genome-chop.py streams one sequence at a time, in batches of windows,
+          as its main() does
+  plugin  _methods reads every sequence into a dict, chops each one and writes
+          all chunks in one _write_fastq call, as chop_sequences does
+
+Results are printed as a table and appended as JSON lines to --results (by default
+results.jsonl in --work-dir, outside the repository), tagged with the git commit,
+so runs can be compared over time. A case whose process dies or runs past
+--timeout is recorded as a failed row and the sweep carries on. The plugin target needs
+q2_types to import _methods, and is skipped when it isn't installed.
+
+Example, adding the 1 Gb reference to the default sweep:
+  python bench_suite.py --sizes 1 10 100 1000
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+SCRIPT = BENCHMARK_DIR.parent / "script" / "genome-chop.py"
+PLUGIN_DIR = BENCHMARK_DIR.parent / "q2-genome-chop"
+
+# Windows chopped and written per batch by the script target, as in fastq_tasks
+BATCH_SIZE = 10000
+
+# Maps every byte value to a base, for turning random bytes into sequence
+BASES = bytes(b"ACGT"[i % 4] for i in range(256))
+
+
+def load_genome_chop():
+    """Import genome-chop.py as a module (its name has a hyphen, so it can't be imported directly)."""
+    spec = importlib.util.spec_from_file_location("genome_chop", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_plugin_methods():
+    """Import the plugin's _methods module, or return None if its QIIME 2 dependencies are missing."""
+    sys.path.insert(0, str(PLUGIN_DIR))
+    try:
+        from q2_genome_chop import _methods
+    except ImportError:
+        return None
+    return _methods
+
+
+def synthetic_reference(work_dir, size_mb, contigs, seed):
+    """Write (once) a reference of size_mb megabases split over contigs, wrapped at 60 bases."""
+    path = Path(work_dir) / f"synthetic_{size_mb}mb_{contigs}contigs_seed{seed}.fa"
+    if path.exists():
+        return path
+    rng = random.Random(seed)
+    contig_len = size_mb * 1_000_000 // contigs
+    partial = path.with_suffix(".fa.part")
+    with open(partial, 'wb') as f:
+        for contig in range(contigs):
+            f.write(f">contig_{contig + 1} synthetic {contig_len} bp\n".encode())
+            # Generate a megabase at a time, keeping lines whole across the pieces
+            written = 0
+            while written < contig_len:
+                piece_len = min(1_000_020, contig_len - written)
+                piece = rng.randbytes(piece_len).translate(BASES)
+                f.write(b"\n".join(piece[i:i + 60] for i in range(0, piece_len, 60)) + b"\n")
+                written += piece_len
+    os.replace(partial, path)
+    return path
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def run_script_case(fasta, output, chunk_size, slide_bp, max_sequences, use_gzip):
+    """Chop a reference with genome-chop.py's functions, returning (reads, stage seconds).
+    
+    Formatting the FASTQ records is counted as part of writing.
+    """
+    genome_chop = load_genome_chop()
+    times = {'read': 0.0, 'chop': 0.0}
+    counts = {'reads': 0}
+
+    start_time = time.perf_counter()
+    if slide_bp == 0:
+        genome_chop.load_fasta_index(str(fasta))
+        records = iter(genome_chop.read_indexed_fasta(str(fasta)))
+    else:
+        records = iter(genome_chop.read_fasta(str(fasta)))
+    times['read'] += time.perf_counter() - start_time
+
+    def blocks():
+        first_tile = 1
+        while not max_sequences or counts['reads'] < max_sequences:
+            start_time = time.perf_counter()
+            record = next(records, None)
+            times['read'] += time.perf_counter() - start_time
+            if record is None:
+                return
+            _, sequence = record
+            remaining = max_sequences - counts['reads'] if max_sequences else None
+            starts = genome_chop.window_starts(len(sequence), chunk_size, slide_bp, remaining)
+            for i in range(0, len(starts), BATCH_SIZE):
+                start_time = time.perf_counter()
+                chunks = list(genome_chop.slice_chunks(sequence, starts[i:i + BATCH_SIZE], chunk_size))
+                times['chop'] += time.perf_counter() - start_time
+                yield genome_chop.format_fastq_records(chunks, fasta.stem, first_tile)
+                first_tile += len(chunks)
+            counts['reads'] += len(starts)
+
+    # write_fastq pulls sequences and chunks through the generator as it goes,
+    # so the time spent reading and chopping is taken back out of its total
+    read_before = times['read']
+    start_time = time.perf_counter()
+    genome_chop.write_fastq(output, blocks(), use_gzip)
+    elapsed = time.perf_counter() - start_time
+    times['write'] = elapsed - (times['read'] - read_before) - times['chop']
+    return counts['reads'], times
+
+
+def run_plugin_case(fasta, output, chunk_size, slide_bp, max_sequences, use_gzip):
+    """Chop a reference with the plugin's _methods functions, returning (reads, stage seconds)."""
+    methods = load_plugin_methods()
+    times = {}
+
+    start_time = time.perf_counter()
+    sequences = methods._read_fasta(str(fasta))
+    times['read'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    all_chunks = []
+    for seq_name, sequence in sequences.items():
+        for start, end, chunk_seq in methods._chop_sequence(sequence, chunk_size, slide_bp, max_sequences):
+            all_chunks.append((f"bench_{seq_name}_{start}_{end}", start, end, chunk_seq))
+        if max_sequences and len(all_chunks) >= max_sequences:
+            all_chunks = all_chunks[:max_sequences]
+            break
+    times['chop'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    methods._write_fastq(output, all_chunks, "bench", use_gzip)
+    times['write'] = time.perf_counter() - start_time
+    return len(all_chunks), times
+
+
+def run_case(target, fasta, chunk_size, slide_bp, max_sequences, use_gzip, results):
+    """Run one case in this process and put its result on the results queue."""
+    runner = run_script_case if target == "script" else run_plugin_case
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output = Path(tmpdir) / ("bench.fastq.gz" if use_gzip else "bench.fastq")
+        random.seed(42)
+        reads, times = runner(fasta, output, chunk_size, slide_bp, max_sequences, use_gzip)
+        output_mb = output.stat().st_size / 1e6
+    results.put({'reads': reads, 'times': times, 'output_mb': output_mb, 'peak_rss_mb': peak_rss_mb()})
+
+
+def wait_for_result(process, results, timeout=None):
+    """Return (result, None) from a case's process, or (None, error) if it died or timed out.
+
+    The queue is polled rather than waited on, so a child killed before putting its
+    result (by the OOM killer, say) can't hang the sweep.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return results.get(timeout=1), None
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            # The result may still have been in the pipe when the process exited
+            try:
+                return results.get(timeout=1), None
+            except queue.Empty:
+                return None, f"exit code {process.exitcode}"
+        if deadline is not None and time.monotonic() > deadline:
+            process.terminate()
+            process.join()
+            return None, f"timed out after {timeout} s"
+
+
+def git_commit():
+    """Return the current git commit of the repository, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark genome-chop.py and the q2-genome-chop plugin")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100],
+                        help="Reference sizes in Mb (default: 1 10 100; add 1000 for a 1 Gb reference)")
+    parser.add_argument("--contigs", type=int, default=4, help="Sequences per reference (default: 4)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=150, help="Chunk size (default: 150)")
+    parser.add_argument("-s", "--slide-bp", type=int, nargs="+", default=[150, 75, 0],
+                        help="Slide sizes to benchmark, 0 for random mode (default: 150 75 0)")
+    parser.add_argument("-n", "--max-sequences", type=int,
+                        help="Reads drawn in random mode (default: enough for 1x coverage)")
+    parser.add_argument("--gzip", choices=["off", "on"], nargs="+", default=["off", "on"],
+                        help="Output compression settings to benchmark (default: off on)")
+    parser.add_argument("--targets", choices=["script", "plugin"], nargs="+", default=["script", "plugin"],
+                        help="Code to benchmark (default: script plugin)")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "genome_chop_bench"),
+                        help="Directory for the cached synthetic references")
+    parser.add_argument("--results",
+                        help="JSON lines file the results are appended to (default: results.jsonl in --work-dir)")
+    parser.add_argument("--timeout", type=float,
+                        help="Seconds a case may run before it is stopped and recorded as failed (default: no limit)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the references (default: 42)")
+    args = parser.parse_args()
+
+    targets = list(args.targets)
+    if "plugin" in targets and load_plugin_methods() is None:
+        print("Skipping the plugin target: q2_genome_chop._methods could not be imported (is QIIME 2 installed?)")
+        targets.remove("plugin")
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results_path = args.results or os.path.join(args.work_dir, "results.jsonl")
+    context = multiprocessing.get_context("spawn")
+    run_info = {'commit': git_commit(), 'python': platform.python_version(),
+                'machine': platform.machine(), 'date': time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    print("target\tsize_mb\tslide\tgzip\treads\tread_s\tchop_s\twrite_s\treads_per_s\tpeak_rss_mb")
+    with open(results_path, 'a') as results_file:
+        for size_mb in args.sizes:
+            fasta = synthetic_reference(args.work_dir, size_mb, args.contigs, args.seed)
+            for target in targets:
+                for slide_bp in args.slide_bp:
+                    max_sequences = args.max_sequences
+                    if slide_bp == 0 and max_sequences is None:
+                        max_sequences = size_mb * 1_000_000 // args.chunk_size
+                    for gzip_setting in args.gzip:
+                        # A fresh process per case, so peak RSS isn't carried over between cases
+                        results = context.Queue()
+                        process = context.Process(target=run_case, args=(
+                            target, fasta, args.chunk_size, slide_bp, max_sequences, gzip_setting == "on", results))
+                        process.start()
+                        result, error = wait_for_result(process, results, args.timeout)
+                        process.join()
+
+                        case = dict(run_info, target=target, size_mb=size_mb, contigs=args.contigs,
+                                    chunk_size=args.chunk_size, slide_bp=slide_bp, max_sequences=max_sequences,
+                                    gzip=gzip_setting == "on")
+                        if error is not None:
+                            print(f"{target}\t{size_mb}\t{slide_bp}\t{gzip_setting}\tFAILED ({error})", flush=True)
+                            results_file.write(json.dumps(dict(case, error=error)) + "\n")
+                            continue
+
+                        times = result['times']
+                        total = sum(times.values())
+                        reads_per_s = result['reads'] / total if total > 0 else 0
+                        print(f"{target}\t{size_mb}\t{slide_bp}\t{gzip_setting}\t{result['reads']}\t"
+                              f"{times['read']:.3f}\t{times['chop']:.3f}\t{times['write']:.3f}\t"
+                              f"{reads_per_s:,.0f}\t{result['peak_rss_mb']:.1f}", flush=True)
+                        results_file.write(json.dumps(dict(case, reads_per_s=reads_per_s, **result)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
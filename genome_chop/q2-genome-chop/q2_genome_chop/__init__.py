@@ -1,5 +1,5 @@
-from ._methods import chop_sequences
+from ._methods import chop_sequences, chop_sequences_paired
 from ._types import ChoppedSequences
 
 __version__ = '0.1.0'
-__all__ = ['chop_sequences', 'ChoppedSequences']
+__all__ = ['chop_sequences', 'chop_sequences_paired', 'ChoppedSequences']
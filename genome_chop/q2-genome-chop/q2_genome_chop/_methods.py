@@ -1,13 +1,18 @@
 import os
-import gzip
+import re
 import random
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
 import pandas as pd
+from fastx_io import BgzfWriter, format_fastq_windows, iter_fasta, load_fasta_index, read_indexed_fasta
 from q2_types.feature_data import DNAFASTAFormat
-from q2_types.per_sample_sequences import SingleLanePerSampleSingleEndFastqDirFmt
+from q2_types.per_sample_sequences import (
+    SingleLanePerSampleSingleEndFastqDirFmt,
+    SingleLanePerSamplePairedEndFastqDirFmt
+)
 
 
 def chop_sequences(
@@ -16,7 +21,12 @@ def chop_sequences(
     slide_bp: int,
     max_sequences: Optional[int] = None,
     random_seed: Optional[int] = None,
-    sample_name: Optional[str] = None
+    sample_name: Optional[str] = None,
+    compression_level: int = 6,
+    threads: int = 1,
+    engine: str = 'python',
+    shard_by: str = 'none',
+    reads_per_shard: int = 1000000
 ) -> SingleLanePerSampleSingleEndFastqDirFmt:
     """
     Chop genome sequences into overlapping chunks.
@@ -36,11 +46,23 @@ def chop_sequences(
     sample_name : str, optional
         Custom sample name for output. If not provided, generates descriptive 
         name based on parameters (e.g., 'sliding_chunks_c100_s50' or 'random_chunks_c150_n500')
+    compression_level : int, optional
+        Gzip compression level (1-9) for the output FASTQ
+    threads : int, optional
+        Number of threads used to compress output blocks
+    engine : str, optional
+        'python' or 'numpy'. The NumPy engine builds FASTQ records as arrays
+        from a strided view of each sequence and gives identical output
+    shard_by : str, optional
+        'none' writes one sample. 'contig' writes one sample per input sequence
+        and 'reads' starts a new sample every reads_per_shard reads
+    reads_per_shard : int, optional
+        Reads per sample when shard_by is 'reads'
         
     Returns
     -------
     SingleLanePerSampleSingleEndFastqDirFmt
-        Chopped sequences in FASTQ format (always gzip compressed)
+        Chopped sequences in FASTQ format (always gzip compressed, written as BGZF)
     """
     
     # Set random seed if provided
@@ -51,179 +73,430 @@ def chop_sequences(
     result = SingleLanePerSampleSingleEndFastqDirFmt()
     
     # Read sequences from the FASTA format object
-    sequences_dict = _read_fasta(str(sequences))
+    num_sequences, sequence_records = _sequence_records(str(sequences), slide_bp)
     
     # Generate sample ID - use custom name if provided, otherwise create descriptive name
-    if sample_name:
-        sample_id = sample_name
-    else:
-        # Generate descriptive name based on parameters
-        if slide_bp == 0:
-            # Random mode
-            max_str = str(max_sequences) if max_sequences else 'all'
-            sample_id = f"random_chunks_c{chunk_size}_n{max_str}"
-        else:
-            # Sliding window mode
-            sample_id = f"sliding_chunks_c{chunk_size}_s{slide_bp}"
+    sample_id = sample_name or _default_sample_id(chunk_size, slide_bp, max_sequences)
     
     # Process all sequences in this file
     all_chunks = []
+    contig_bounds = []
+    fastq_blocks = {}
+    total_chunks = 0
     total_input_bases = 0
     
-    for seq_name, sequence in sequences_dict.items():
+    for seq_name, sequence in sequence_records:
         total_input_bases += len(sequence)
-        chunks = _chop_sequence(sequence, chunk_size, slide_bp, max_sequences)
         
-        # Add metadata to chunks
-        for i, (start, end, chunk_seq) in enumerate(chunks):
-            chunk_id = f"{sample_id}_{seq_name}_{start}_{end}"
-            all_chunks.append((chunk_id, start, end, chunk_seq))
+        if engine == 'numpy':
+            # Format this sequence's records straight away, taking only as many
+            # windows as the overall limit still allows. Records are split where
+            # a shard boundary falls so every block belongs to one shard
+            remaining = max_sequences - total_chunks if max_sequences else None
+            starts = _window_starts(len(sequence), chunk_size, slide_bp, remaining)
+            comment_prefix = f"+{sample_id}_{seq_name}_".encode()
+            for shard_key, lo, hi in _shard_slices(seq_name, total_chunks, len(starts), shard_by, reads_per_shard):
+                if not isinstance(sequence, str) or sequence.isascii():
+                    block = format_fastq_windows(sequence, 0, starts[lo:hi], chunk_size, _HEADER_PREFIX,
+                                                 _HEADER_SUFFIX, comment_prefix, b"_", total_chunks + lo + 1)
+                else:
+                    # Non-ASCII characters don't map one-to-one onto bytes, so format in Python
+                    chunks = [(f"{sample_id}_{seq_name}_{start}_{start + chunk_size - 1}", start,
+                               start + chunk_size - 1, sequence[start:start + chunk_size]) for start in starts[lo:hi]]
+                    block = _format_fastq_records(chunks, first_tile=total_chunks + lo + 1)
+                fastq_blocks.setdefault(shard_key, []).append(block)
+            total_chunks += len(starts)
+        else:
+            chunks = _chop_sequence(sequence, chunk_size, slide_bp, max_sequences)
+            contig_bounds.append((seq_name, len(all_chunks)))
+            
+            # Add metadata to chunks
+            for i, (start, end, chunk_seq) in enumerate(chunks):
+                chunk_id = f"{sample_id}_{seq_name}_{start}_{end}"
+                all_chunks.append((chunk_id, start, end, chunk_seq))
+            total_chunks = len(all_chunks)
         
         # If we have max_sequences limit and we've reached it, break
-        if max_sequences and len(all_chunks) >= max_sequences:
+        if max_sequences and total_chunks >= max_sequences:
             all_chunks = all_chunks[:max_sequences]
+            total_chunks = max_sequences
             break
     
-    # Write FASTQ output - QIIME 2 always requires gzipped format
-    output_filename = f"{sample_id}_sequences_L001_R1_001.fastq.gz"
-        
-    output_path = result.path / output_filename
-    # Note: compress_output parameter is ignored - QIIME 2 format requires gzip
-    _write_fastq(output_path, all_chunks, sample_id, use_gzip=True)
+    # Shards of the python engine's chunks are contiguous runs of all_chunks
+    shard_ranges = {}
+    contig_bounds.append((None, len(all_chunks)))
+    for (seq_name, first), (_, last) in zip(contig_bounds[:-1], contig_bounds[1:]):
+        last = min(last, len(all_chunks))
+        for shard_key, lo, hi in _shard_slices(seq_name, first, last - first, shard_by, reads_per_shard):
+            shard_start, _ = shard_ranges.get(shard_key, (first + lo, None))
+            shard_ranges[shard_key] = (shard_start, first + hi)
+    
+    # Write FASTQ output - QIIME 2 always requires gzipped format. Each shard
+    # is its own sample with its own file, and records keep the tile numbers
+    # they would have in a single file
+    shard_keys = list(fastq_blocks if engine == 'numpy' else shard_ranges)
+    if not shard_keys:
+        shard_keys = [None]
+    shard_ids = [_shard_sample_id(sample_id, shard_by, shard_key) for shard_key in shard_keys]
+    if len(set(shard_ids)) < len(shard_ids):
+        raise ValueError("Sequence names give duplicate sample IDs when sharding by contig")
+    
+    def write_shard(shard_key, shard_id, compression_threads):
+        output_filename = f"{shard_id}_sequences_L001_R1_001.fastq.gz"
+        output_path = result.path / output_filename
+        if engine == 'numpy':
+            _write_fastq_blocks(output_path, fastq_blocks.get(shard_key, []), use_gzip=True,
+                                compression_level=compression_level, threads=compression_threads)
+        else:
+            shard_start, shard_end = shard_ranges.get(shard_key, (0, 0))
+            _write_fastq(output_path, all_chunks[shard_start:shard_end], shard_id, use_gzip=True,
+                         compression_level=compression_level, threads=compression_threads,
+                         first_tile=shard_start + 1)
+        return output_filename
+    
+    if len(shard_keys) == 1:
+        # A single file gets all the threads for compressing its blocks
+        output_filenames = [write_shard(shard_keys[0], shard_ids[0], threads)]
+    else:
+        # Shards are written concurrently, one compressing thread each
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            output_filenames = list(executor.map(write_shard, shard_keys, shard_ids,
+                                                 [1] * len(shard_keys)))
     
     # Create required MANIFEST file for QIIME 2
     manifest_path = result.path / "MANIFEST"
-    _write_manifest(manifest_path, sample_id, output_filename)
+    _write_manifest(manifest_path, [(shard_id, output_filename, 'forward')
+                                    for shard_id, output_filename in zip(shard_ids, output_filenames)])
     
     # Create required metadata.yml file for QIIME 2
     metadata_path = result.path / "metadata.yml"
     _write_metadata(metadata_path)
     
     # Calculate and log statistics
-    total_output_bases = len(all_chunks) * chunk_size
+    total_output_bases = total_chunks * chunk_size
     coverage = total_output_bases / total_input_bases if total_input_bases > 0 else 0
     
-    print(f"Processed {sample_id}: {len(sequences_dict)} sequences, "
-          f"{total_input_bases:,} input bases -> {len(all_chunks)} chunks, "
+    print(f"Processed {sample_id}: {num_sequences} sequences, "
+          f"{total_input_bases:,} input bases -> {total_chunks} chunks, "
           f"{total_output_bases:,} output bases, {coverage:.2f}x coverage")
+    if len(shard_ids) > 1:
+        print(f"Wrote {len(shard_ids)} samples, sharded by {shard_by}")
     
     return result
 
 
-def _read_fasta(filepath):
-    """Read FASTA file and return sequence name and sequence."""
-    sequences = {}
-    current_name = None
-    current_seq = []
-    
-    with open(filepath, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('>'):
-                if current_name:
-                    sequences[current_name] = ''.join(current_seq)
-                current_name = line[1:]  # Remove '>' character
-                current_seq = []
-            else:
-                current_seq.append(line)
+def chop_sequences_paired(
+    sequences: DNAFASTAFormat,
+    chunk_size: int,
+    slide_bp: int,
+    insert_size: int = 300,
+    insert_sd: float = 30.0,
+    max_sequences: Optional[int] = None,
+    random_seed: Optional[int] = None,
+    sample_name: Optional[str] = None,
+    compression_level: int = 6,
+    threads: int = 1
+) -> SingleLanePerSamplePairedEndFastqDirFmt:
+    """
+    Chop genome sequences into paired-end reads.
+    
+    Each window starts a fragment whose length is drawn from a normal
+    distribution. Read 1 is the start of the fragment and read 2 is the
+    reverse complement of its end, both taken in one pass over the sequence.
+    
+    Parameters
+    ----------
+    sequences : DNAFASTAFormat
+        Input DNA sequences in FASTA format
+    chunk_size : int
+        Length of each read in base pairs
+    slide_bp : int
+        Step size between fragments in base pairs. Use 0 for random mode
+    insert_size : int, optional
+        Mean fragment length in base pairs
+    insert_sd : float, optional
+        Standard deviation of the fragment length
+    max_sequences : int, optional
+        Maximum number of read pairs to produce
+    random_seed : int, optional
+        Random seed for reproducible fragment positions and lengths
+    sample_name : str, optional
+        Custom sample name for output. If not provided, generates descriptive
+        name based on parameters
+    compression_level : int, optional
+        Gzip compression level (1-9) for the output FASTQ files
+    threads : int, optional
+        Number of threads used to compress each output file
+        
+    Returns
+    -------
+    SingleLanePerSamplePairedEndFastqDirFmt
+        Read pairs in FASTQ format, R1 and R2 files written as BGZF
+    """
+    
+    # Set random seed if provided
+    if random_seed is not None:
+        random.seed(random_seed)
+    
+    result = SingleLanePerSamplePairedEndFastqDirFmt()
+    num_sequences, sequence_records = _sequence_records(str(sequences), slide_bp)
+    sample_id = sample_name or _default_sample_id(chunk_size, slide_bp, max_sequences)
+    
+    # Both mates of every pair are cut from the sequence while it is in hand
+    forward_chunks = []
+    reverse_chunks = []
+    total_input_bases = 0
+    
+    for seq_name, sequence in sequence_records:
+        total_input_bases += len(sequence)
+        remaining = max_sequences - len(forward_chunks) if max_sequences else None
+        starts = _window_starts(len(sequence), chunk_size, slide_bp, remaining)
+        fragments = _fragment_lengths(starts, len(sequence), chunk_size, insert_size, insert_sd)
+        for start, end, read1, mate_start, mate_end, read2 in _slice_read_pairs(sequence, starts, fragments, chunk_size):
+            # Both mates carry the read 1 coordinates in their header so the read names match,
+            # and each comment line keeps the coordinates of its own read
+            forward_chunks.append((f"{sample_id}_{seq_name}_{start}_{end}", start, end, read1))
+            reverse_chunks.append((f"{sample_id}_{seq_name}_{mate_start}_{mate_end}", start, end, read2))
         
-        # Don't forget the last sequence
-        if current_name:
-            sequences[current_name] = ''.join(current_seq)
+        if max_sequences and len(forward_chunks) >= max_sequences:
+            break
+    
+    # Write the R1 and R2 files at the same time
+    output_filenames = [f"{sample_id}_sequences_L001_R{read}_001.fastq.gz" for read in (1, 2)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        writes = [executor.submit(_write_fastq, result.path / filename, chunks, sample_id, use_gzip=True,
+                                  compression_level=compression_level, threads=threads, read_number=read)
+                  for read, filename, chunks in zip((1, 2), output_filenames, (forward_chunks, reverse_chunks))]
+        for write in writes:
+            write.result()
+    
+    _write_manifest(result.path / "MANIFEST", [(sample_id, output_filenames[0], 'forward'),
+                                                (sample_id, output_filenames[1], 'reverse')])
+    _write_metadata(result.path / "metadata.yml")
     
-    return sequences
+    total_pairs = len(forward_chunks)
+    total_output_bases = 2 * total_pairs * chunk_size
+    coverage = total_output_bases / total_input_bases if total_input_bases > 0 else 0
+    
+    print(f"Processed {sample_id}: {num_sequences} sequences, "
+          f"{total_input_bases:,} input bases -> {total_pairs} read pairs, "
+          f"{total_output_bases:,} output bases, {coverage:.2f}x coverage")
+    
+    return result
 
 
-def _chop_sequence(sequence, chunk_size, slide_bp, max_sequences=None):
-    """Generate overlapping chunks from a sequence."""
-    chunks = []
-    seq_len = len(sequence)
+def _sequence_records(fasta_path, slide_bp):
+    """Return (number of sequences, iterable of (name, sequence)) for a FASTA file.
     
+    Random mode only needs the sampled windows, so it reads them from an
+    indexed mmap of the file instead of loading every sequence.
+    """
+    fasta_index = None
+    if slide_bp == 0:
+        try:
+            # The index is not written out, since the input lives inside an artifact's data directory
+            fasta_index = load_fasta_index(fasta_path, save=False)
+        except ValueError:
+            pass  # Gzipped or unevenly wrapped files can't be indexed; read everything instead
+    
+    if fasta_index is not None:
+        return len(fasta_index), read_indexed_fasta(fasta_path, fasta_index)
+    sequences_dict = _read_fasta(fasta_path)
+    return len(sequences_dict), sequences_dict.items()
+
+
+def _default_sample_id(chunk_size, slide_bp, max_sequences):
+    """Generate a descriptive sample name based on the chopping parameters."""
+    if slide_bp == 0:
+        # Random mode
+        max_str = str(max_sequences) if max_sequences else 'all'
+        return f"random_chunks_c{chunk_size}_n{max_str}"
+    # Sliding window mode
+    return f"sliding_chunks_c{chunk_size}_s{slide_bp}"
+
+
+def _read_fasta(filepath):
+    """Read FASTA file (plain or gzipped) and return sequence name and sequence."""
+    return {name.decode(): sequence.decode() for name, sequence in iter_fasta(filepath) if name}
+
+
+def _sample_random_starts(seq_len, chunk_size, max_sequences):
+    """Pick max_sequences sorted random chunk start positions in a sequence of length seq_len.
+    
+    Sampling from a range object rather than a list keeps the cost proportional to
+    max_sequences instead of seq_len, and draws the same positions for a given seed.
+    """
+    valid_starts = range(seq_len - chunk_size + 1)
+    if len(valid_starts) == 0:
+        return []  # Sequence too short
+    
+    # Sample random starts (with replacement if needed)
+    num_chunks = min(max_sequences, len(valid_starts))
+    random_starts = random.sample(valid_starts, num_chunks)
+    
+    # If we need more sequences than unique positions, sample with replacement
+    if max_sequences > len(valid_starts):
+        additional_needed = max_sequences - len(valid_starts)
+        random_starts.extend(random.choices(valid_starts, k=additional_needed))
+    
+    # Sort starts for consistent output
+    random_starts.sort()
+    return random_starts
+
+
+def _window_starts(seq_len, chunk_size, slide_bp, max_sequences=None):
+    """Return the chunk start positions for a sequence of length seq_len, as a range or sorted list."""
     if slide_bp == 0:
         # Random sequence mode
         if max_sequences is None:
             max_sequences = 100  # Default for random mode
-        
-        # Generate random start positions
-        valid_starts = list(range(seq_len - chunk_size + 1))
-        if len(valid_starts) == 0:
-            return chunks  # Sequence too short
-        
-        # Sample random starts
-        num_chunks = min(max_sequences, len(valid_starts))
-        random_starts = random.sample(valid_starts, min(num_chunks, len(valid_starts)))
-        
-        # If we need more sequences than unique positions, sample with replacement
-        if max_sequences > len(valid_starts):
-            additional_needed = max_sequences - len(valid_starts)
-            random_starts.extend(random.choices(valid_starts, k=additional_needed))
-        
-        # Sort starts for consistent output
-        random_starts.sort()
-        
-        for start in random_starts:
-            end = start + chunk_size
-            chunk = sequence[start:end]
-            chunks.append((start, end - 1, chunk))
-            
-    else:
-        # Regular sliding window mode
-        for start in range(0, seq_len - chunk_size + 1, slide_bp):
-            end = start + chunk_size
-            chunk = sequence[start:end]
-            chunks.append((start, end - 1, chunk))
-            
-            # Check if we've reached max sequences
-            if max_sequences and len(chunks) >= max_sequences:
-                break
-                
-            # Break if we've reached the end
-            if end >= seq_len:
-                break
+        return _sample_random_starts(seq_len, chunk_size, max_sequences)
     
+    # Regular sliding window mode, stopping at the last chunk that fits or at max sequences
+    starts = range(0, seq_len - chunk_size + 1, slide_bp)
+    if max_sequences:
+        starts = starts[:max_sequences]
+    return starts
+
+
+def _chop_sequence(sequence, chunk_size, slide_bp, max_sequences=None):
+    """Generate overlapping chunks from a sequence."""
+    chunks = []
+    for start in _window_starts(len(sequence), chunk_size, slide_bp, max_sequences):
+        end = start + chunk_size
+        chunks.append((start, end - 1, sequence[start:end]))
     return chunks
 
 
+# Complement of each IUPAC nucleotide code, for reverse-complementing mates
+_COMPLEMENT = str.maketrans("ACGTRYKMBVDHNacgtrykmbvdhn", "TGCAYRMKVBHDNtgcayrmkvbhdn")
+
+
+def _fragment_lengths(starts, seq_len, chunk_size, insert_size, insert_sd):
+    """Draw a fragment length for each start, clamped to hold both reads within the sequence."""
+    lengths = []
+    for start in starts:
+        length = round(random.gauss(insert_size, insert_sd)) if insert_sd > 0 else insert_size
+        lengths.append(min(max(length, chunk_size), seq_len - start))
+    return lengths
+
+
+def _slice_read_pairs(sequence, starts, fragments, chunk_size):
+    """Generate (start, end, read1, mate_start, mate_end, read2) tuples, read 2 reverse-complemented."""
+    for start, fragment in zip(starts, fragments):
+        end = start + chunk_size
+        mate_end = start + fragment
+        mate_start = mate_end - chunk_size
+        yield (start, end - 1, sequence[start:end],
+               mate_start, mate_end - 1, sequence[mate_start:mate_end].translate(_COMPLEMENT)[::-1])
+
+
+# Header fields of every record, up to the tile number, and after the y coordinate
+# (read 1, or read 2 for the reverse mates of paired output)
+_HEADER_PREFIX = b"@SIM:001:QIIME2:1:"
+_HEADER_SUFFIX = b" 1:N:0:ATCG\n"
+_MATE_HEADER_SUFFIX = b" 2:N:0:ATCG\n"
+
+# Records formatted and written per block by _write_fastq
+_FASTQ_BATCH_SIZE = 10000
+
+
 def _write_metadata(metadata_file):
     """Write metadata.yml file required by QIIME 2 SingleLanePerSampleSingleEndFastqDirFmt."""
     with open(metadata_file, 'w') as f:
         f.write("phred-offset: 33\n")
 
 
-def _write_manifest(manifest_file, sample_id, fastq_filename):
-    """Write MANIFEST file required by QIIME 2 SingleLanePerSampleSingleEndFastqDirFmt."""
+def _write_manifest(manifest_file, samples):
+    """Write MANIFEST file required by QIIME 2 SingleLanePerSampleSingleEndFastqDirFmt.
+    
+    samples is a list of (sample_id, fastq_filename, direction) tuples, one row each.
+    """
     with open(manifest_file, 'w') as f:
         # Try CSV format instead of TSV
         f.write("sample-id,filename,direction\n")
-        f.write(f"{sample_id},{fastq_filename},forward\n")
+        for sample_id, fastq_filename, direction in samples:
+            f.write(f"{sample_id},{fastq_filename},{direction}\n")
+
+
+def _shard_slices(seq_name, first, count, shard_by, reads_per_shard):
+    """Split count records, numbered from first in the overall run, at shard boundaries.
+    
+    Yields (shard_key, lo, hi) with lo and hi relative to first. The key is None
+    for a single sample, the sequence name per contig, or the shard number per N reads.
+    """
+    if count <= 0:
+        return
+    if shard_by == 'contig':
+        yield seq_name, 0, count
+    elif shard_by == 'reads':
+        lo = 0
+        while lo < count:
+            shard_number = (first + lo) // reads_per_shard
+            hi = min(count, (shard_number + 1) * reads_per_shard - first)
+            yield shard_number, lo, hi
+            lo = hi
+    else:
+        yield None, 0, count
+
+
+def _shard_sample_id(sample_id, shard_by, shard_key):
+    """Return the sample ID for one shard of the output."""
+    if shard_key is None:
+        return sample_id  # No reads at all: one empty, unsharded sample
+    if shard_by == 'contig':
+        # Sample IDs go into file names, so keep only characters QIIME 2 accepts there
+        return f"{sample_id}_{re.sub(r'[^A-Za-z0-9.-]', '-', shard_key)}"
+    if shard_by == 'reads':
+        return f"{sample_id}_shard{shard_key + 1:04d}"
+    return sample_id
 
 
-def _write_fastq(output_file, chunks, sample_id, use_gzip=False):
-    """Write chunks to FASTQ format with Illumina-style headers."""
+def _write_fastq_blocks(output_file, blocks, use_gzip=False, compression_level=6, threads=1):
+    """Write already formatted FASTQ byte blocks to the output file in order."""
+    if use_gzip:
+        output = BgzfWriter(output_file, compression_level, threads)
+    else:
+        output = open(output_file, 'wb')
+    
+    with output as f:
+        for block in blocks:
+            f.write(block)
+
+
+def _write_fastq(output_file, chunks, sample_id, use_gzip=False, compression_level=6, threads=1,
+                 first_tile=1, read_number=1):
+    """Write chunks to FASTQ format with Illumina-style headers, numbering tiles from first_tile.
+    
+    Gzip output is written as BGZF, with blocks compressed on a pool of threads.
+    """
     
     # Choose file opening method based on gzip option
-    open_func = gzip.open if use_gzip else open
-    mode = 'wt' if use_gzip else 'w'
-    
-    with open_func(output_file, mode) as f:
-        for i, (chunk_id, start, end, chunk) in enumerate(chunks):
-            # Create Illumina-style header for QIIME 2 compatibility
-            instrument = "SIM"  # Simulator
-            run = "001"
-            flowcell = "QIIME2"
-            lane = "1"
-            tile = str(i + 1).zfill(4)
-            x_coord = str(start).zfill(5)
-            y_coord = str(end).zfill(5)
-            read_num = "1"  # Single-end read
-            filtered = "N"  # Not filtered
-            control = "0"   # Not a control
-            index = "ATCG"  # Simple index
-            
-            seq_id = f"{instrument}:{run}:{flowcell}:{lane}:{tile}:{x_coord}:{y_coord} {read_num}:{filtered}:{control}:{index}"
+    if use_gzip:
+        output = BgzfWriter(output_file, compression_level, threads)
+    else:
+        output = open(output_file, 'wb')
+    
+    with output as f:
+        for batch_start in range(0, len(chunks), _FASTQ_BATCH_SIZE):
+            batch = chunks[batch_start:batch_start + _FASTQ_BATCH_SIZE]
+            f.write(_format_fastq_records(batch, first_tile=first_tile + batch_start, read_number=read_number))
+
+
+def _format_fastq_records(chunks, first_tile=1, read_number=1):
+    """Format (chunk_id, start, end, chunk) tuples as FASTQ bytes with Illumina-style headers.
+    
+    Each record is filled into one template around the constant header fields,
+    and the batch is encoded in one pass.
+    """
+    prefix = _HEADER_PREFIX.decode()
+    suffix = (_MATE_HEADER_SUFFIX if read_number == 2 else _HEADER_SUFFIX).decode()
+    records = []
+    quality = ""
+    for tile, (chunk_id, start, end, chunk) in enumerate(chunks, first_tile):
+        if len(chunk) != len(quality):
             quality = "I" * len(chunk)  # High quality scores (Illumina Q40)
-            
-            f.write(f"@{seq_id}\n")
-            f.write(f"{chunk}\n")
-            f.write(f"+{chunk_id}\n")  # Keep chunk info in comment line
-            f.write(f"{quality}\n")
+        # Keep chunk info in comment line
+        records.append(f"{prefix}{str(tile).zfill(4)}:{str(start).zfill(5)}:{str(end).zfill(5)}{suffix}"
+                       f"{chunk}\n+{chunk_id}\n{quality}\n")
+    return ''.join(records).encode()
@@ -1,13 +1,14 @@
 import importlib
-from qiime2.plugin import Plugin, Str, Int, Bool, Choices, Citations
+from qiime2.plugin import Plugin, Str, Int, Float, Bool, Choices, Range, Citations
 from q2_types.feature_data import FeatureData, Sequence
 from q2_types.sample_data import SampleData
 from q2_types.per_sample_sequences import (
     SequencesWithQuality, 
+    PairedEndSequencesWithQuality,
     SingleLanePerSampleSingleEndFastqDirFmt
 )
 
-from ._methods import chop_sequences
+from ._methods import chop_sequences, chop_sequences_paired
 from ._types import ChoppedSequences
 
 # Define citations
@@ -38,7 +39,12 @@ plugin.methods.register_function(
         'slide_bp': Int,
         'max_sequences': Int,
         'random_seed': Int,
-        'sample_name': Str
+        'sample_name': Str,
+        'compression_level': Int % Range(1, 10),
+        'threads': Int % Range(1, None),
+        'engine': Str % Choices(['python', 'numpy']),
+        'shard_by': Str % Choices(['none', 'contig', 'reads']),
+        'reads_per_shard': Int % Range(1, None)
     },
     outputs=[
         ('chopped_sequences', SampleData[SequencesWithQuality])
@@ -51,7 +57,12 @@ plugin.methods.register_function(
         'slide_bp': 'Step size between chunks in base pairs. Use 0 for random mode',
         'max_sequences': 'Maximum number of output sequences to produce (optional)',
         'random_seed': 'Random seed for reproducible random mode (optional)',
-        'sample_name': 'Custom sample name for output. If not provided, generates descriptive name based on parameters (optional)'
+        'sample_name': 'Custom sample name for output. If not provided, generates descriptive name based on parameters (optional)',
+        'compression_level': 'Gzip compression level for the output FASTQ, from 1 (fastest) to 9 (smallest)',
+        'threads': 'Number of threads used to compress the output FASTQ',
+        'engine': "Chunking engine. 'numpy' builds FASTQ records as arrays from a strided view of each sequence, with output identical to 'python'",
+        'shard_by': "Split the output into several samples: 'none' writes one sample, 'contig' writes one sample per input sequence and 'reads' starts a new sample every reads_per_shard reads. Shards are written concurrently using the threads",
+        'reads_per_shard': "Number of reads per sample when shard_by is 'reads'"
     },
     output_descriptions={
         'chopped_sequences': 'Chopped sequences in FASTQ format with quality scores'
@@ -60,3 +71,45 @@ plugin.methods.register_function(
     description='Chop genome sequences into overlapping chunks with sliding window or random sampling',
     citations=[citations['genome_chop_2025']]
 )
+
+# Register the paired-end method
+plugin.methods.register_function(
+    function=chop_sequences_paired,
+    inputs={
+        'sequences': FeatureData[Sequence]
+    },
+    parameters={
+        'chunk_size': Int,
+        'slide_bp': Int,
+        'insert_size': Int % Range(1, None),
+        'insert_sd': Float % Range(0, None),
+        'max_sequences': Int,
+        'random_seed': Int,
+        'sample_name': Str,
+        'compression_level': Int % Range(1, 10),
+        'threads': Int % Range(1, None)
+    },
+    outputs=[
+        ('chopped_sequences', SampleData[PairedEndSequencesWithQuality])
+    ],
+    input_descriptions={
+        'sequences': 'Input DNA sequences in FASTA format to be chopped'
+    },
+    parameter_descriptions={
+        'chunk_size': 'Length of each read in base pairs',
+        'slide_bp': 'Step size between fragments in base pairs. Use 0 for random mode',
+        'insert_size': 'Mean fragment length in base pairs. Fragments are clamped to hold both reads within the sequence',
+        'insert_sd': 'Standard deviation of the fragment length',
+        'max_sequences': 'Maximum number of read pairs to produce (optional)',
+        'random_seed': 'Random seed for reproducible fragment positions and lengths (optional)',
+        'sample_name': 'Custom sample name for output. If not provided, generates descriptive name based on parameters (optional)',
+        'compression_level': 'Gzip compression level for the output FASTQ files, from 1 (fastest) to 9 (smallest)',
+        'threads': 'Number of threads used to compress each output FASTQ file'
+    },
+    output_descriptions={
+        'chopped_sequences': 'Read pairs in FASTQ format with quality scores; read 2 is the reverse complement of the fragment end'
+    },
+    name='Chop genome sequences into paired-end reads',
+    description='Chop genome sequences into paired-end reads with a normal insert size distribution, taking both mates from one pass over each sequence',
+    citations=[citations['genome_chop_2025']]
+)
@@ -18,7 +18,8 @@ setup(
         'qiime2 >= 2023.2.0',
         'scikit-bio',
         'pandas',
-        'numpy'
+        'numpy',
+        'fastx-io'
     ],
     zip_safe=False,
     classifiers=[
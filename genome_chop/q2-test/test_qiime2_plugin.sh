@@ -331,6 +331,79 @@ else
 fi
 check_result $RESULT
 
+# Test 11: Sharded output, a new sample every 2 reads
+print_test "11" "Sharded output (5 sequences split into samples of 2 reads)"
+CMD="qiime genome-chop chop-sequences --i-sequences \"$OUTPUT_DIR/input_sequences.qza\" --p-chunk-size 100 --p-slide-bp 50 --p-shard-by reads --p-reads-per-shard 2 --p-threads 2 --o-chopped-sequences \"$OUTPUT_DIR/sharded_reads.qza\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_qza_file "$OUTPUT_DIR/sharded_reads.qza"; then
+    qiime tools export --input-path "$OUTPUT_DIR/sharded_reads.qza" --output-path "$EXPORT_DIR/sharded_reads" > /dev/null 2>&1
+    FILE_COUNT=$(find "$EXPORT_DIR/sharded_reads" -name "*.fastq.gz" | wc -l)
+    TOTAL_COUNT=$(find "$EXPORT_DIR/sharded_reads" -name "*.fastq.gz" -exec gunzip -c {} + | grep -c "^@SIM")
+    BASIC_COUNT=$(count_sequences_in_export "$EXPORT_DIR/basic_sliding")
+    echo "Generated $FILE_COUNT samples with $TOTAL_COUNT sequences (unsharded run had $BASIC_COUNT)"
+    if [ "$FILE_COUNT" -eq 3 ] && [ "$TOTAL_COUNT" -eq "$BASIC_COUNT" ]; then
+        RESULT=0
+    else
+        echo "Expected 3 samples with $BASIC_COUNT sequences in total"
+        RESULT=1
+    fi
+else
+    echo "Sharded output test failed"
+    RESULT=1
+fi
+check_result $RESULT
+
+# Test 12: Paired-end output
+print_test "12" "Paired-end reads (chop-sequences-paired)"
+CMD="qiime genome-chop chop-sequences-paired --i-sequences \"$OUTPUT_DIR/input_sequences.qza\" --p-chunk-size 100 --p-slide-bp 50 --p-insert-size 150 --p-insert-sd 0 --o-chopped-sequences \"$OUTPUT_DIR/paired_reads.qza\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_qza_file "$OUTPUT_DIR/paired_reads.qza"; then
+    qiime tools export --input-path "$OUTPUT_DIR/paired_reads.qza" --output-path "$EXPORT_DIR/paired_reads" > /dev/null 2>&1
+    R1_FILE=$(find "$EXPORT_DIR/paired_reads" -name "*_R1_001.fastq.gz" | head -1)
+    R2_FILE=$(find "$EXPORT_DIR/paired_reads" -name "*_R2_001.fastq.gz" | head -1)
+    if [ -n "$R1_FILE" ] && [ -n "$R2_FILE" ]; then
+        R1_COUNT=$(gunzip -c "$R1_FILE" | grep -c "^@SIM")
+        R2_COUNT=$(gunzip -c "$R2_FILE" | grep -c "^@SIM")
+    else
+        R1_COUNT=0
+        R2_COUNT=-1
+    fi
+    echo "Generated $R1_COUNT R1 reads and $R2_COUNT R2 reads"
+    if [ "$R1_COUNT" -gt 0 ] && [ "$R1_COUNT" -eq "$R2_COUNT" ]; then
+        RESULT=0
+    else
+        echo "Expected the same number of R1 and R2 reads"
+        RESULT=1
+    fi
+else
+    echo "Paired-end test failed"
+    RESULT=1
+fi
+check_result $RESULT
+
+# Test 13: Sharded output when no reads are produced
+print_test "13" "Sharded output with no reads (chunk size larger than every sequence)"
+RESULT=0
+for SHARD_BY in contig reads; do
+    CMD="qiime genome-chop chop-sequences --i-sequences \"$OUTPUT_DIR/input_sequences.qza\" --p-chunk-size 400 --p-slide-bp 100 --p-shard-by $SHARD_BY --p-reads-per-shard 2 --o-chopped-sequences \"$OUTPUT_DIR/empty_shards_$SHARD_BY.qza\""
+    run_command "$CMD"
+    if [ $? -eq 0 ] && check_qza_file "$OUTPUT_DIR/empty_shards_$SHARD_BY.qza"; then
+        qiime tools export --input-path "$OUTPUT_DIR/empty_shards_$SHARD_BY.qza" --output-path "$EXPORT_DIR/empty_shards_$SHARD_BY" > /dev/null 2>&1
+        FILE_COUNT=$(find "$EXPORT_DIR/empty_shards_$SHARD_BY" -name "*.fastq.gz" | wc -l)
+        SEQ_COUNT=$(count_sequences_in_export "$EXPORT_DIR/empty_shards_$SHARD_BY")
+        echo "shard-by $SHARD_BY: $FILE_COUNT samples with $SEQ_COUNT sequences (expected 1 empty sample)"
+        if [ "$FILE_COUNT" -ne 1 ] || [ "$SEQ_COUNT" -ne 0 ]; then
+            RESULT=1
+        fi
+    else
+        echo "Sharded output with no reads failed for shard-by $SHARD_BY"
+        RESULT=1
+    fi
+done
+check_result $RESULT
+
 # Summary
 echo -e "${YELLOW}=== TEST SUMMARY ===${NC}"
 echo "Tests run: $TESTS_RUN"
@@ -6,120 +6,316 @@ Genome chopping script that takes a FASTA file and produces overlapping chunks i
 import argparse
 import os
 import random
-import gzip
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Needed for --engine numpy; without it, records are formatted in Python
+
+try:
+    from fastx_io import (BgzfWriter, IndexedSequence, format_fastq_chunks, format_fastq_windows, iter_fasta,
+                          load_fasta_index, read_indexed_fasta)
+except ImportError:
+    # Running from a checkout without fastx_io installed: use the copy in the repository
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "fastx_io"))
+    from fastx_io import (BgzfWriter, IndexedSequence, format_fastq_chunks, format_fastq_windows, iter_fasta,
+                          load_fasta_index, read_indexed_fasta)
+
 
 def read_fasta(filepath):
-    """Read FASTA file and return sequence name and sequence."""
-    sequences = {}
-    current_name = None
-    current_seq = []
-    
-    with open(filepath, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('>'):
-                if current_name:
-                    sequences[current_name] = ''.join(current_seq)
-                current_name = line[1:]  # Remove '>' character
-                current_seq = []
-            else:
-                current_seq.append(line)
-        
-        # Don't forget the last sequence
-        if current_name:
-            sequences[current_name] = ''.join(current_seq)
-    
-    return sequences
+    """Read FASTA file (plain or gzipped) and yield (sequence name, sequence) one record at a time."""
+    for name, sequence in iter_fasta(filepath):
+        if name:
+            yield name.decode(), sequence.decode()
 
 
-def chop_sequence(sequence, chunk_size, slide_bp, max_sequences=None):
-    """Generate overlapping chunks from a sequence."""
-    chunks = []
-    seq_len = len(sequence)
+def sample_random_starts(seq_len, chunk_size, max_sequences):
+    """Pick max_sequences sorted random chunk start positions in a sequence of length seq_len.
+    
+    Sampling from a range object rather than a list keeps the cost proportional to
+    max_sequences instead of seq_len, and draws the same positions for a given seed.
+    """
+    valid_starts = range(seq_len - chunk_size + 1)
+    if len(valid_starts) == 0:
+        return []  # Sequence too short
+    
+    # Sample random starts (with replacement if needed)
+    num_chunks = min(max_sequences, len(valid_starts))
+    random_starts = random.sample(valid_starts, num_chunks)
     
+    # If we need more sequences than unique positions, sample with replacement
+    if max_sequences > len(valid_starts):
+        additional_needed = max_sequences - len(valid_starts)
+        random_starts.extend(random.choices(valid_starts, k=additional_needed))
+    
+    # Sort starts for consistent output
+    random_starts.sort()
+    return random_starts
+
+
+def window_starts(seq_len, chunk_size, slide_bp, max_sequences=None):
+    """Return the chunk start positions for a sequence of length seq_len, as a range or sorted list."""
     if slide_bp == 0:
         # Random sequence mode
         if max_sequences is None:
             max_sequences = 100  # Default for random mode
+        return sample_random_starts(seq_len, chunk_size, max_sequences)
+    
+    # Regular sliding window mode, stopping at the last chunk that fits or at max sequences
+    starts = range(0, seq_len - chunk_size + 1, slide_bp)
+    if max_sequences:
+        starts = starts[:max_sequences]
+    return starts
+
+
+def slice_chunks(sequence, starts, chunk_size, offset=0):
+    """Lazily generate (start, end, chunk) tuples for the given starts.
+    
+    offset is the position of sequence[0] in the full sequence, for when only a segment is passed.
+    """
+    for start in starts:
+        end = start + chunk_size
+        yield start, end - 1, sequence[start - offset:end - offset]
+
+
+def chop_sequence(sequence, chunk_size, slide_bp, max_sequences=None):
+    """Lazily generate overlapping (start, end, chunk) tuples from a sequence."""
+    starts = window_starts(len(sequence), chunk_size, slide_bp, max_sequences)
+    return slice_chunks(sequence, starts, chunk_size)
+
+
+# Complement of each IUPAC nucleotide code, for reverse-complementing mates
+COMPLEMENT = str.maketrans("ACGTRYKMBVDHNacgtrykmbvdhn", "TGCAYRMKVBHDNtgcayrmkvbhdn")
+
+
+def reverse_complement(sequence):
+    """Return the reverse complement of a nucleotide sequence."""
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+def fragment_lengths(starts, seq_len, chunk_size, insert_size, insert_sd):
+    """Draw a fragment length for each start from a normal insert size distribution.
+    
+    Lengths are clamped so every fragment holds a full read at each end and stays within the sequence.
+    """
+    lengths = []
+    for start in starts:
+        length = round(random.gauss(insert_size, insert_sd)) if insert_sd > 0 else insert_size
+        lengths.append(min(max(length, chunk_size), seq_len - start))
+    return lengths
+
+
+def slice_read_pairs(sequence, starts, fragments, chunk_size, offset=0):
+    """Lazily generate (start, end, read1, mate_start, mate_end, read2) tuples for the given fragments.
+    
+    Read 1 is the forward strand at the start of each fragment and read 2 is the reverse
+    complement of its other end, both taken in the same pass over the sequence.
+    """
+    for start, fragment in zip(starts, fragments):
+        end = start + chunk_size
+        mate_end = start + fragment
+        mate_start = mate_end - chunk_size
+        yield (start, end - 1, sequence[start - offset:end - offset],
+               mate_start, mate_end - 1, reverse_complement(sequence[mate_start - offset:mate_end - offset]))
+
+
+def plan_windows(records, chunk_size, slide_bp, max_sequences=None, totals=None):
+    """Yield (sequence name, sequence, starts) for each record, stopping at max_sequences overall.
+    
+    Records are consumed one at a time, so only the current sequence is held in memory.
+    If a totals dict is given, it is updated with 'chunks' and 'input_bases' counts.
+    """
+    if totals is None:
+        totals = {}
+    totals.setdefault('chunks', 0)
+    totals.setdefault('input_bases', 0)
+    mode_info = "random" if slide_bp == 0 else "sliding window"
+    
+    for seq_name, sequence in records:
+        totals['input_bases'] += len(sequence)
         
-        # Generate random start positions
-        valid_starts = list(range(seq_len - chunk_size + 1))
-        if len(valid_starts) == 0:
-            return chunks  # Sequence too short
-        
-        # Sample random starts (with replacement if needed)
-        num_chunks = min(max_sequences, len(valid_starts))
-        random_starts = random.sample(valid_starts, min(num_chunks, len(valid_starts)))
-        
-        # If we need more sequences than unique positions, sample with replacement
-        if max_sequences > len(valid_starts):
-            additional_needed = max_sequences - len(valid_starts)
-            random_starts.extend(random.choices(valid_starts, k=additional_needed))
+        # Only ask this sequence for as many chunks as the overall limit still allows
+        remaining = max_sequences - totals['chunks'] if max_sequences else None
+        starts = window_starts(len(sequence), chunk_size, slide_bp, remaining)
+        totals['chunks'] += len(starts)
         
-        # Sort starts for consistent output
-        random_starts.sort()
+        print(f"Processed sequence '{seq_name}' ({mode_info} mode): {len(sequence)} bases -> {len(starts)} chunks")
+        yield seq_name, sequence, starts
         
-        for start in random_starts:
-            end = start + chunk_size
-            chunk = sequence[start:end]
-            chunks.append((start, end - 1, chunk))
-            
+        # If we have max_sequences limit and we've reached it, stop reading
+        if max_sequences and totals['chunks'] >= max_sequences:
+            break
+
+
+# Illumina-style FASTQ header: @instrument:run:flowcell:lane:tile:x:y read:filtered:control:index
+# Simulated reads come from instrument SIM, run 001, flowcell INSILICO, lane 1, and are
+# read 1 (read 2 for paired mates), not filtered, not a control, with a simple ATCG index
+HEADER_PREFIX = "@SIM:001:INSILICO:1:"
+HEADER_SUFFIX = " 1:N:0:ATCG"
+MATE_HEADER_SUFFIX = " 2:N:0:ATCG"
+
+# High quality scores (Illumina Q40), cached per read length
+_quality_strings = {}
+
+
+def quality_string(length):
+    """Return the all-Q40 quality line for a read of the given length."""
+    quality = _quality_strings.get(length)
+    if quality is None:
+        quality = _quality_strings[length] = "I" * length
+    return quality
+
+
+def format_fastq_records(chunks, base_filename, first_tile=1):
+    """Format (start, end, chunk) tuples as FASTQ bytes with Illumina-style headers.
+    
+    Tiles are numbered consecutively from first_tile. With NumPy installed, a batch of
+    equal-length ASCII chunks is built as arrays by format_fastq_chunks. Otherwise each
+    record is filled into one template around the constant header fields, and the batch
+    is encoded in one pass. Both give the same bytes.
+    """
+    chunks = list(chunks)
+    if np is not None:
+        try:
+            return format_fastq_chunks(chunks, HEADER_PREFIX.encode(), f"{HEADER_SUFFIX}\n".encode(),
+                                       f"+{base_filename}:".encode(), b"-", first_tile)
+        except ValueError:
+            pass  # Mixed lengths or non-ASCII sequence
+    prefix, suffix = HEADER_PREFIX, HEADER_SUFFIX
+    records = []
+    quality = ""
+    for tile, (start, end, chunk) in enumerate(chunks, first_tile):
+        if len(chunk) != len(quality):
+            quality = quality_string(len(chunk))
+        # Tile numbers the record and x/y are the chunk's start and end;
+        # the comment line keeps the genomic coordinates
+        x_coord, y_coord = str(start), str(end)
+        records.append(f"{prefix}{str(tile).zfill(4)}:{x_coord.zfill(5)}:{y_coord.zfill(5)}{suffix}\n"
+                       f"{chunk}\n+{base_filename}:{x_coord}-{y_coord}\n{quality}\n")
+    return ''.join(records).encode()
+
+
+def format_fastq_pairs(pairs, base_filename, first_tile=1):
+    """Format read pair tuples from slice_read_pairs as (R1 bytes, R2 bytes).
+    
+    Both mates carry the read 1 coordinates in their header, so their read names match;
+    each comment line keeps the genomic coordinates of its own read.
+    """
+    prefix, suffix, mate_suffix = HEADER_PREFIX, HEADER_SUFFIX, MATE_HEADER_SUFFIX
+    records, mates = [], []
+    quality = ""
+    for tile, (start, end, read1, mate_start, mate_end, read2) in enumerate(pairs, first_tile):
+        if len(read1) != len(quality):
+            quality = quality_string(len(read1))
+        x_coord, y_coord = str(start), str(end)
+        name = f"{prefix}{str(tile).zfill(4)}:{x_coord.zfill(5)}:{y_coord.zfill(5)}"
+        records.append(f"{name}{suffix}\n{read1}\n+{base_filename}:{x_coord}-{y_coord}\n{quality}\n")
+        mates.append(f"{name}{mate_suffix}\n{read2}\n+{base_filename}:{mate_start}-{mate_end}\n{quality}\n")
+    return ''.join(records).encode(), ''.join(mates).encode()
+
+
+def write_fastq(output_file, blocks, use_gzip=False, compression_level=6, threads=1):
+    """Write already formatted FASTQ byte blocks to the output file in order.
+    
+    Gzip output is written as BGZF, compressed on a pool of threads.
+    """
+    if use_gzip:
+        output = BgzfWriter(output_file, compression_level, threads)
     else:
-        # Regular sliding window mode
-        for start in range(0, seq_len - chunk_size + 1, slide_bp):
-            end = start + chunk_size
-            chunk = sequence[start:end]
-            chunks.append((start, end - 1, chunk))
-            
-            # Check if we've reached max sequences
-            if max_sequences and len(chunks) >= max_sequences:
-                break
-                
-            # Break if we've reached the end
-            if end >= seq_len:
-                break
-    
-    return chunks
-
-
-def write_fastq(output_file, chunks, input_filename, seq_name, use_gzip=False):
-    """Write chunks to FASTQ format with Illumina-style headers."""
+        output = open(output_file, 'wb')
+    
+    with output as f:
+        for block in blocks:
+            f.write(block)
+
+
+def write_paired_fastq(output_files, block_pairs, use_gzip=False, compression_level=6, threads=1):
+    """Write (R1 block, R2 block) pairs to the two output files, one writer thread per file."""
+    if use_gzip:
+        outputs = [BgzfWriter(output_file, compression_level, threads) for output_file in output_files]
+    else:
+        outputs = [open(output_file, 'wb') for output_file in output_files]
+    
+    with outputs[0] as r1, outputs[1] as r2, ThreadPoolExecutor(max_workers=2) as executor:
+        for r1_block, r2_block in block_pairs:
+            r2_write = executor.submit(r2.write, r2_block)
+            r1.write(r1_block)
+            r2_write.result()
+
+
+def paired_output_files(output_file):
+    """Return the R1 and R2 file names for an output file, e.g. reads.fastq.gz -> reads_R1.fastq.gz."""
+    output_file = Path(output_file)
+    name = output_file.name
+    for extension in ('.fastq.gz', '.fq.gz', '.fastq', '.fq'):
+        if name.endswith(extension):
+            stem = name[:-len(extension)]
+            break
+    else:
+        stem, extension = name, ''
+    return [output_file.with_name(f"{stem}_R{read}{extension}") for read in (1, 2)]
+
+
+def fastq_tasks(planned_windows, chunk_size, input_filename, engine='python', batch_size=10000,
+                insert_size=None, insert_sd=0):
+    """Split planned windows into batches for chop_and_format, each with its first tile number.
+    
+    A batch only carries the part of the sequence it covers. With an insert_size, each
+    batch also carries its fragment lengths, drawn here so they don't depend on which
+    worker formats the batch.
+    """
     base_filename = Path(input_filename).stem  # Get filename without extension
+    first_tile = 1
+    for seq_name, sequence, starts in planned_windows:
+        for i in range(0, len(starts), batch_size):
+            batch_starts = starts[i:i + batch_size]
+            fragments = None
+            batch_end = batch_starts[-1] + chunk_size
+            if insert_size is not None:
+                fragments = fragment_lengths(batch_starts, len(sequence), chunk_size, insert_size, insert_sd)
+                batch_end = max(start + fragment for start, fragment in zip(batch_starts, fragments))
+            if isinstance(sequence, IndexedSequence):
+                # Windows are read straight from the mmap, even in worker processes
+                segment, offset = sequence, 0
+            else:
+                offset = batch_starts[0]
+                segment = sequence[offset:batch_end]
+            yield segment, offset, batch_starts, chunk_size, base_filename, first_tile, engine, fragments
+            first_tile += len(batch_starts)
+
+
+def chop_and_format(task):
+    """Slice one batch of windows from a sequence segment and format it as FASTQ bytes.
+    
+    Batches with fragment lengths give a pair of (R1 bytes, R2 bytes) instead.
+    """
+    segment, offset, starts, chunk_size, base_filename, first_tile, engine, fragments = task
+    if fragments is not None:
+        return format_fastq_pairs(slice_read_pairs(segment, starts, fragments, chunk_size, offset),
+                                  base_filename, first_tile)
+    if engine == 'numpy' and (not isinstance(segment, str) or segment.isascii()):
+        return format_fastq_windows(segment, offset, starts, chunk_size, HEADER_PREFIX.encode(),
+                                    f"{HEADER_SUFFIX}\n".encode(), f"+{base_filename}:".encode(), b"-", first_tile)
+    return format_fastq_records(slice_chunks(segment, starts, chunk_size, offset), base_filename, first_tile)
+
+
+def parallel_fastq_blocks(tasks, threads):
+    """Run chop_and_format over tasks on a process pool, yielding its results in input order.
     
-    # Choose file opening method based on gzip option
-    open_func = gzip.open if use_gzip else open
-    mode = 'wt' if use_gzip else 'w'
-    
-    with open_func(output_file, mode) as f:
-        for i, (start, end, chunk) in enumerate(chunks):
-            # Illumina-style FASTQ format:
-            # @instrument:run:flowcell:lane:tile:x:y read:filtered:control:index
-            # sequence
-            # +optional_description
-            # quality_scores
-            
-            # Create Illumina-style header
-            instrument = "SIM"  # Simulator
-            run = "001"
-            flowcell = "INSILICO"
-            lane = "1"
-            tile = str(i + 1).zfill(4)  # Tile number based on sequence index
-            x_coord = str(start).zfill(5)  # X coordinate as start position
-            y_coord = str(end).zfill(5)    # Y coordinate as end position
-            read_num = "1"  # Single-end read
-            filtered = "N"  # Not filtered
-            control = "0"   # Not a control
-            index = "ATCG"  # Simple index
-            
-            seq_id = f"{instrument}:{run}:{flowcell}:{lane}:{tile}:{x_coord}:{y_coord} {read_num}:{filtered}:{control}:{index}"
-            quality = "I" * len(chunk)  # High quality scores (Illumina Q40)
-            
-            f.write(f"@{seq_id}\n")
-            f.write(f"{chunk}\n")
-            f.write(f"+{base_filename}:{start}-{end}\n")  # Keep genomic coordinates in comment line
-            f.write(f"{quality}\n")
+    At most two batches per worker are in flight, so memory stays bounded while reading ahead.
+    """
+    with ProcessPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(chop_and_format, task))
+            if len(pending) >= threads * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
 def main():
@@ -133,16 +329,27 @@ Examples:
   %(prog)s -i input.fa -c 200 -s 100 -o results/         # Output to directory with default name
   %(prog)s -i input.fa -c 100 -s 50 -z                   # Gzip compressed output
   %(prog)s -i input.fa -c 100 -s 50 -o output/ -z        # Gzip output to directory
+  %(prog)s -i input.fa -c 100 -s 10 -t 8                 # Chop and format on 8 processes
+  %(prog)s -i input.fa -c 100 -s 10 -z -l 1 -t 8         # Fast gzip, compressed on 8 threads
+  %(prog)s -i input.fa -c 100 -s 10 -e numpy             # Vectorised NumPy engine, same output
+  %(prog)s -i input.fa -c 150 -s 50 -p --insert-size 400  # Paired-end reads, 400bp mean insert
   %(prog)s --input-file genome.fa --chunk-size 200 --slide-bp 100  # Long form options
 
 Output Options:
   -o filename.fastq    : Specific output filename
   -o directory/        : Use default filename in specified directory
-  -z                   : Compress output with gzip (.gz extension added automatically)
+  -z                   : Compress output with gzip (.gz extension added automatically).
+                         Written as BGZF blocks (as bgzip does), compressed on --threads threads
+  -p                   : Paired-end output, written to <name>_R1.fastq and <name>_R2.fastq
 
 Modes:
   Sliding window mode (slide-bp > 0): Creates overlapping chunks at regular intervals
-  Random mode (slide-bp = 0): Selects random start positions for chunks
+  Random mode (slide-bp = 0): Selects random start positions for chunks.
+    Windows are read from a memory-mapped input using a samtools-style .fai
+    index, which is created next to the FASTA file if it is missing or stale.
+  Paired-end mode (-p): Each window starts a fragment whose length is drawn from a
+    normal distribution (--insert-size, --insert-sd). Read 1 is the start of the
+    fragment and read 2 the reverse complement of its end.
 
 The script reads FASTA format files and outputs overlapping sequence chunks
 in FASTQ format with Illumina-style headers and high-quality base scores. 
@@ -157,12 +364,17 @@ with downstream tools like Kraken, BWA, etc.
     parser.add_argument("-n", "--max-sequences", type=int, help="Maximum number of output sequences to produce")
     parser.add_argument("-o", "--output", help="Output FASTQ file or directory. If directory (ends with /), uses default filename. Default: input_name_chopped.fastq in input directory")
     parser.add_argument("-z", "--gzip", action="store_true", help="Compress output with gzip (.gz extension added automatically)")
+    parser.add_argument("-l", "--compression-level", type=int, default=6, choices=range(1, 10), metavar="{1-9}", help="Gzip compression level used with -z (default: 6)")
+    parser.add_argument("-t", "--threads", type=int, default=1, help="Number of worker processes for chopping and formatting, and threads for gzip compression (default: 1)")
+    parser.add_argument("-e", "--engine", choices=["python", "numpy"], default="python", help="Chunking engine: 'numpy' cuts windows as strided array views of the sequence instead of slicing them one by one, with identical output. Paired-end reads are always formatted in Python (default: python)")
+    parser.add_argument("-p", "--paired", action="store_true", help="Write paired-end reads (R1 and R2 files) instead of single-end reads")
+    parser.add_argument("--insert-size", type=int, default=300, help="Mean fragment length for paired-end reads (default: 300)")
+    parser.add_argument("--insert-sd", type=float, default=30, help="Standard deviation of the fragment length for paired-end reads (default: 30)")
     parser.add_argument("-v", "--version", action="version", version="%(prog)s 1.0")
     
     args = parser.parse_args()
-    
-    # Read input FASTA
-    sequences = read_fasta(args.input_file)
+    if args.engine == "numpy" and np is None:
+        parser.error("--engine numpy requires NumPy to be installed")
     
     # Determine output filename
     if args.output:
@@ -189,34 +401,39 @@ with downstream tools like Kraken, BWA, etc.
             default_filename += ".gz"
         output_file = input_path.parent / default_filename
     
-    # Process each sequence in the FASTA file
-    all_chunks = []
-    total_input_bases = 0
+    # Random mode only needs the sampled windows, so read them from an indexed mmap of the file
+    records = read_fasta(args.input_file)
+    if args.slide_bp == 0:
+        try:
+            load_fasta_index(args.input_file)
+            records = read_indexed_fasta(args.input_file)
+        except (ValueError, UnicodeDecodeError) as e:
+            print(f"Could not index {args.input_file} ({e}); reading sequences into memory instead")
     
-    for seq_name, sequence in sequences.items():
-        total_input_bases += len(sequence)
-        chunks = chop_sequence(sequence, args.chunk_size, args.slide_bp, args.max_sequences)
-        all_chunks.extend(chunks)
-        
-        mode_info = "random" if args.slide_bp == 0 else "sliding window"
-        print(f"Processed sequence '{seq_name}' ({mode_info} mode): {len(sequence)} bases -> {len(chunks)} chunks")
-        
-        # If we have max_sequences limit and we've reached it, break
-        if args.max_sequences and len(all_chunks) >= args.max_sequences:
-            all_chunks = all_chunks[:args.max_sequences]  # Trim to exact limit
-            break
+    # Stream each sequence in the FASTA file through the chopper and straight into the writer
+    totals = {}
+    planned_windows = plan_windows(records, args.chunk_size, args.slide_bp, args.max_sequences, totals)
+    tasks = fastq_tasks(planned_windows, args.chunk_size, args.input_file, args.engine,
+                        insert_size=args.insert_size if args.paired else None, insert_sd=args.insert_sd)
+    if args.threads > 1:
+        blocks = parallel_fastq_blocks(tasks, args.threads)
+    else:
+        blocks = map(chop_and_format, tasks)
+    if args.paired:
+        output_files = paired_output_files(output_file)
+        write_paired_fastq(output_files, blocks, args.gzip, args.compression_level, args.threads)
+        output_file = " and ".join(str(f) for f in output_files)
+    else:
+        write_fastq(output_file, blocks, args.gzip, args.compression_level, args.threads)
     
     # Calculate coverage statistics
-    total_output_bases = len(all_chunks) * args.chunk_size
+    total_chunks = totals['chunks']
+    total_input_bases = totals['input_bases']
+    total_output_bases = total_chunks * args.chunk_size * (2 if args.paired else 1)
     average_coverage = total_output_bases / total_input_bases if total_input_bases > 0 else 0
     
-    # Write all chunks to output file
-    # Use the first sequence name for the output (assuming single sequence for now)
-    first_seq_name = list(sequences.keys())[0]
-    write_fastq(output_file, all_chunks, args.input_file, first_seq_name, args.gzip)
-    
     print(f"Output written to: {output_file}")
-    print(f"Total chunks generated: {len(all_chunks)}")
+    print(f"Total {'read pairs' if args.paired else 'chunks'} generated: {total_chunks}")
     print(f"Total input bases: {total_input_bases:,}")
     print(f"Total output bases: {total_output_bases:,}")
     print(f"Average coverage: {average_coverage:.2f}x")
@@ -386,6 +386,138 @@ else
     RESULT=1
 fi
 check_result $RESULT
+
+# Test 16: Random mode uses a samtools-style .fai index
+print_test "16" "Random mode builds a .fai index next to the input"
+rm -f "$INPUT.fai"
+CMD="python3 \"$SCRIPT\" -i \"$INPUT\" -c 60 -s 0 -n 4 -o \"$OUTPUT_DIR/test16.fastq\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_file "$INPUT.fai"; then
+    FAI_LINE=$(cat "$INPUT.fai")
+    echo "Index: $FAI_LINE"
+    # 300 bases starting after the 17-byte header, wrapped at 60 bases per 61-byte line
+    SEQ_COUNT=$(count_sequences "$OUTPUT_DIR/test16.fastq")
+    if [ "$FAI_LINE" == "$(printf 'test_sequence_1\t300\t17\t60\t61')" ] && [ "$SEQ_COUNT" -eq 4 ]; then
+        RESULT=0
+    else
+        echo "Expected index 'test_sequence_1 300 17 60 61' and 4 sequences, got $SEQ_COUNT sequences"
+        RESULT=1
+    fi
+else
+    echo "Index file not created at $INPUT.fai"
+    RESULT=1
+fi
+check_result $RESULT
+# The index is a by-product of the test, not an input
+rm -f "$INPUT.fai"
+
+# Test 17: Multi-process chopping gives the same output as a single process
+print_test "17" "Multi-process chopping (--threads 2) matches single-process output"
+CMD="python3 \"$SCRIPT\" -i \"$INPUT\" -c 50 -s 5 -t 2 -o \"$OUTPUT_DIR/test17.fastq\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_file "$OUTPUT_DIR/test17.fastq"; then
+    python3 "$SCRIPT" -i "$INPUT" -c 50 -s 5 -o "$OUTPUT_DIR/test17_serial.fastq" > /dev/null
+    SEQ_COUNT=$(count_sequences "$OUTPUT_DIR/test17.fastq")
+    echo "Generated $SEQ_COUNT sequences"
+    # With 300bp input, 50bp chunks, 5bp steps: should generate 51 sequences
+    if [ "$SEQ_COUNT" -eq 51 ] && cmp -s "$OUTPUT_DIR/test17.fastq" "$OUTPUT_DIR/test17_serial.fastq"; then
+        echo "Output is identical to the single-process run"
+        RESULT=0
+    else
+        echo "Expected 51 sequences identical to the single-process run, got $SEQ_COUNT"
+        RESULT=1
+    fi
+else
+    RESULT=1
+fi
+check_result $RESULT
+
+# Test 18: Multi-threaded BGZF compression
+print_test "18" "Multi-threaded BGZF compression (-z -l 1 -t 2)"
+CMD="python3 \"$SCRIPT\" -i \"$INPUT\" -c 50 -s 5 -z -l 1 -t 2 -o \"$OUTPUT_DIR/test18.fastq\""
+run_command "$CMD"
+RESULT=$?
+EXPECTED_FILE="$OUTPUT_DIR/test18.fastq.gz"
+if [ $RESULT -eq 0 ] && check_file "$EXPECTED_FILE"; then
+    # BGZF blocks are gzip members whose header carries a 'BC' extra field (flag byte 04)
+    HEADER=$(head -c 14 "$EXPECTED_FILE" | od -An -tx1 | tr -d ' \n')
+    echo "Block header: $HEADER"
+    if [ "$HEADER" == "1f8b08040000000000ff06004243" ] && gunzip -c "$EXPECTED_FILE" | cmp -s - "$OUTPUT_DIR/test17_serial.fastq"; then
+        echo "Output is BGZF and decompresses to the uncompressed output"
+        RESULT=0
+    else
+        echo "Output is not BGZF or its content differs from $OUTPUT_DIR/test17_serial.fastq"
+        RESULT=1
+    fi
+else
+    echo "BGZF output file not created at $EXPECTED_FILE"
+    RESULT=1
+fi
+check_result $RESULT
+
+# Test 19: NumPy engine gives the same output as the Python engine
+print_test "19" "NumPy engine (--engine numpy) matches Python engine output"
+CMD="python3 \"$SCRIPT\" -i \"$INPUT\" -c 50 -s 5 -e numpy -o \"$OUTPUT_DIR/test19.fastq\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_file "$OUTPUT_DIR/test19.fastq"; then
+    if cmp -s "$OUTPUT_DIR/test19.fastq" "$OUTPUT_DIR/test17_serial.fastq"; then
+        echo "Output is identical to the Python engine run"
+        RESULT=0
+    else
+        echo "Output differs from $OUTPUT_DIR/test17_serial.fastq"
+        RESULT=1
+    fi
+else
+    RESULT=1
+fi
+check_result $RESULT
+
+# Test 20: Paired-end output
+print_test "20" "Paired-end reads (-p) write matching R1 and R2 files"
+CMD="python3 \"$SCRIPT\" -i \"$INPUT\" -c 50 -s 5 -p --insert-size 120 --insert-sd 0 -o \"$OUTPUT_DIR/test20.fastq\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_file "$OUTPUT_DIR/test20_R1.fastq" && check_file "$OUTPUT_DIR/test20_R2.fastq"; then
+    # R1 is the single-end output, and R2 has the same read names with read number 2
+    R1_NAMES=$(grep "^@SIM" "$OUTPUT_DIR/test20_R1.fastq" | cut -d' ' -f1)
+    R2_NAMES=$(grep "^@SIM" "$OUTPUT_DIR/test20_R2.fastq" | cut -d' ' -f1)
+    R2_READ_NUMS=$(grep "^@SIM" "$OUTPUT_DIR/test20_R2.fastq" | cut -d' ' -f2 | cut -d: -f1 | sort -u)
+    if cmp -s "$OUTPUT_DIR/test20_R1.fastq" "$OUTPUT_DIR/test17_serial.fastq" && [ "$R1_NAMES" = "$R2_NAMES" ] && [ "$R2_READ_NUMS" = "2" ]; then
+        echo "R1 matches the single-end run and R2 read names match R1"
+        RESULT=0
+    else
+        echo "R1 differs from $OUTPUT_DIR/test17_serial.fastq or R2 read names don't match"
+        RESULT=1
+    fi
+else
+    RESULT=1
+fi
+check_result $RESULT
+
+# Test 21: Random mode on gzipped input reads it into memory instead of indexing it
+print_test "21" "Random mode on gzipped input (.fa.gz)"
+gzip -nc "$INPUT" > "$OUTPUT_DIR/test21_input.fa.gz"
+rm -f "$OUTPUT_DIR/test21_input.fa.gz.fai"
+CMD="python3 \"$SCRIPT\" -i \"$OUTPUT_DIR/test21_input.fa.gz\" -c 60 -s 0 -n 4 -o \"$OUTPUT_DIR/test21.fastq\""
+run_command "$CMD"
+RESULT=$?
+if [ $RESULT -eq 0 ] && check_file "$OUTPUT_DIR/test21.fastq"; then
+    SEQ_COUNT=$(count_sequences "$OUTPUT_DIR/test21.fastq")
+    echo "Generated $SEQ_COUNT sequences"
+    if [ "$SEQ_COUNT" -eq 4 ] && [ ! -e "$OUTPUT_DIR/test21_input.fa.gz.fai" ]; then
+        RESULT=0
+    else
+        echo "Expected 4 sequences and no index of the gzipped input"
+        RESULT=1
+    fi
+else
+    echo "Output file not created at $OUTPUT_DIR/test21.fastq"
+    RESULT=1
+fi
+check_result $RESULT
 echo "Tests run: $TESTS_RUN"
 echo "Tests passed: $TESTS_PASSED"
 echo "Tests failed: $((TESTS_RUN - TESTS_PASSED))"
@@ -1,17 +1,21 @@
 #!/usr/bin/env python3
 
 import sys
+from pathlib import Path
+
+try:
+    from fastx_io import iter_fastq_batches
+except ImportError:
+    # Running from a checkout without fastx_io installed: use the copy in the repository
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "fastx_io"))
+    from fastx_io import iter_fastq_batches
 
 def sort_fastq_sequences(input_file, output_file):
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-        line_num = 0
-        for line in infile:
-            line_num += 1
-            if line_num % 4 == 2:  # Line 2 (sequence line)
-                sorted_sequence = ''.join(sorted(line.strip())) + '\n'
-                outfile.write(sorted_sequence)
-            else:  # Lines 1, 3, 4 (header, plus, quality)
-                outfile.write(line)
+    with open(output_file, 'wb') as outfile:
+        for batch in iter_fastq_batches(input_file):
+            # Sort the bases of each sequence line; header, plus and quality are unchanged
+            outfile.write(b''.join(b"%s\n%s\n%s\n%s\n" % (header, bytes(sorted(sequence)), plus, quality)
+                                   for header, sequence, plus, quality in batch))
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
@@ -7,53 +7,65 @@ original and shuffled files.
 """
 
 import argparse
-import gzip
 import random
 import sys
 import os
 from collections import Counter
+from itertools import zip_longest
 from pathlib import Path
 
-__version__ = "v0.0.32"
+try:
+    from fastx_io import FastqIndex, iter_fastq, read_name
+except ImportError:
+    # Running from a checkout without fastx_io installed: use the copy in the repository
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "fastx_io"))
+    from fastx_io import FastqIndex, iter_fastq, read_name
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Without NumPy, --all checks reads one at a time with verify_read
 
-def is_gzipped(filename):
-    """Check if file is gzipped by reading magic number"""
-    try:
-        with open(filename, 'rb') as f:
-            return f.read(2) == b'\x1f\x8b'
-    except:
-        return False
+__version__ = "v0.0.37"
 
+# Columns of a composition count matrix, in order
+COMPOSITION = ('A', 'C', 'G', 'T', 'N', 'other')
 
-def open_file(filename):
-    """Open file, automatically detecting if it's gzipped"""
-    if is_gzipped(filename):
-        return gzip.open(filename, 'rt')
-    else:
-        return open(filename, 'r')
-
-
-def parse_fastq(filename):
-    """Parse FASTQ file (regular or gzipped) and return dictionary of {read_name: sequence}"""
-    reads = {}
-    with open_file(filename) as f:
-        while True:
-            header = f.readline().strip()
-            if not header:
-                break
-            if not header.startswith('@'):
-                continue
-            
-            sequence = f.readline().strip()
-            plus = f.readline().strip()
-            quality = f.readline().strip()
-            
-            # Extract read name (remove @ and take first part before space/tab)
-            read_name = header[1:].split()[0]
-            reads[read_name] = sequence
+# Most bytes of padded sequence checked at once by check_read_batch in --all mode
+BATCH_BYTES = 1 << 20
+
+
+def sample_reads(filename, num_reads):
+    """Pick num_reads reads uniformly at random from a FASTQ file in one pass
     
-    return reads
+    Returns ({read_name: sequence} for the chosen reads, total reads in the file). Only
+    the chosen reads are kept (reservoir sampling): each new read replaces a random one
+    of them with chance num_reads/reads seen so far.
+    """
+    reservoir = []
+    total = 0
+    for header, sequence, plus, quality in iter_fastq(filename):
+        if total < num_reads:
+            reservoir.append((header, sequence))
+        else:
+            slot = random.randrange(total + 1)
+            if slot < num_reads:
+                reservoir[slot] = (header, sequence)
+        total += 1
+    # Read name is the part of the header after @ and before the first space/tab
+    return {read_name(header).decode(): sequence.decode() for header, sequence in reservoir}, total
+
+
+def find_reads(filename, read_names):
+    """Return ({read_name: sequence} for the reads of a FASTQ file named in read_names, total reads in the file)"""
+    found = {}
+    total = 0
+    for header, sequence, plus, quality in iter_fastq(filename):
+        name = read_name(header).decode()
+        if name in read_names:
+            found[name] = sequence.decode()
+        total += 1
+    return found, total
 
 
 def count_nucleotides(sequence):
@@ -81,198 +93,458 @@ def count_nucleotides(sequence):
     }
 
 
+def open_index(filename):
+    """Open a file's sidecar index, building it on first use, or return None if it can't be indexed
+    
+    That includes an index that can't be written, as in a read-only directory, so the
+    file is then streamed instead.
+    """
+    try:
+        return FastqIndex(filename)
+    except (ValueError, OSError) as e:
+        print(f"Not using an index for {filename}: {e}", file=sys.stderr)
+        return None
+
+
+def sample_indexed_reads(index, num_reads):
+    """Pick num_reads reads at random through a file's index, returning ({read_name: sequence}, total reads)"""
+    chosen = random.sample(range(len(index)), min(num_reads, len(index)))
+    records = (index.record_at(index.offsets[i]) for i in sorted(chosen))
+    return {read_name(header).decode(): sequence.decode() for header, sequence, plus, quality in records}, len(index)
+
+
+def find_indexed_reads(index, read_names):
+    """Look up reads by name through a file's index, returning ({read_name: sequence} of those found, total reads)"""
+    found = {}
+    for name in read_names:
+        record = index.get(name.encode())
+        if record is not None:
+            found[name] = record[1].decode()
+    return found, len(index)
+
+
+def stream_read_pairs(original_file, shuffled_file, max_pending=1000000):
+    """Yield (read_name, original_seq, shuffled_seq) for every read of two FASTQ files, read side by side
+    
+    While the files list reads in the same order each pair is checked and dropped at
+    once, so memory stays constant. Reads that don't line up wait in a dict per file
+    until their partner turns up (a hash join); more than max_pending of them at once
+    raises ValueError rather than growing without bound. A read found in only one
+    file comes out at the end with None for the other sequence. Sequences are bytes.
+    """
+    pending_original = {}
+    pending_shuffled = {}
+    for original, shuffled in zip_longest(iter_fastq(original_file), iter_fastq(shuffled_file)):
+        original_name = read_name(original[0]).decode() if original else None
+        shuffled_name = read_name(shuffled[0]).decode() if shuffled else None
+        if original_name == shuffled_name:
+            yield original_name, original[1], shuffled[1]
+            continue
+        
+        if original:
+            if original_name in pending_shuffled:
+                yield original_name, original[1], pending_shuffled.pop(original_name)
+            else:
+                pending_original[original_name] = original[1]
+        if shuffled:
+            if shuffled_name in pending_original:
+                yield shuffled_name, pending_original.pop(shuffled_name), shuffled[1]
+            else:
+                pending_shuffled[shuffled_name] = shuffled[1]
+        if len(pending_original) + len(pending_shuffled) > max_pending:
+            raise ValueError(f"More than {max_pending} reads are waiting for their partner: the files' read "
+                             f"orders differ too much to stream (see --max-pending)")
+    
+    for name, sequence in pending_original.items():
+        yield name, sequence, None
+    for name, sequence in pending_shuffled.items():
+        yield name, None, sequence
+
+
 def has_single_unique_character(sequence):
     """Check if sequence contains only one unique character"""
     return len(set(sequence.upper())) == 1
 
 
-def sequences_match_composition(seq1, seq2):
-    """Check if two sequences have the same nucleotide composition"""
-    counts1 = count_nucleotides(seq1)
-    counts2 = count_nucleotides(seq2)
-    return counts1 == counts2
+def pad_sequences(sequences, width):
+    """Copy sequences (bytes) into the rows of an (N, width) uint8 array, padded with zero bytes
+    
+    Returns (lengths, array). Sequences that are all width long are used without copying.
+    """
+    lengths = np.fromiter(map(len, sequences), dtype=np.intp, count=len(sequences))
+    buffer = np.frombuffer(b''.join(sequences), dtype=np.uint8)
+    if (lengths == width).all():
+        return lengths, buffer.reshape(len(sequences), width)
+    padded = np.zeros((len(sequences), width), dtype=np.uint8)
+    padded[np.arange(width) < lengths[:, None]] = buffer
+    return lengths, padded
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Verify FASTQ shuffling tool preserves nucleotide counts"
-    )
-    parser.add_argument("-v", "--version", action="version", version=f"fastq_verify.py {__version__}")
-    parser.add_argument("original_file", help="Original FASTQ file")
-    parser.add_argument("shuffled_file", help="Shuffled FASTQ file")
-    parser.add_argument("-n", "--num_reads", type=int, default=100, help="Number of reads to test (default: 100)")
-    parser.add_argument("-o", "--output", help="Output table filename")
+def composition_matrix(padded, lengths):
+    """Count A, C, G, T, N and other bytes in every row of pad_sequences' output at once
     
-    # Check if no arguments provided and show help
-    if len(sys.argv) == 1:
-        parser.print_help(sys.stderr)
-        sys.exit(2)
+    Returns an (N, 6) array with a column per COMPOSITION entry, case-insensitive like
+    count_nucleotides. Setting bit 5 of every byte turns upper case letters into lower
+    case (and padding into a space), so each base takes one comparison across the
+    whole array; other is whatever is left of each sequence's length.
+    """
+    folded = padded | 0x20
+    counts = np.empty((len(padded), len(COMPOSITION)), dtype=np.intp)
+    for column, base in enumerate(b'acgtn'):
+        counts[:, column] = (folded == base).sum(axis=1)
+    counts[:, -1] = lengths - counts[:, :-1].sum(axis=1)
+    return counts
+
+
+def check_read_batch(original_seqs, shuffled_seqs):
+    """Run verify_read's checks on many pairs of original and shuffled sequences (bytes) at once
     
-    args = parser.parse_args()
+    Returns three boolean arrays with an entry per pair: passed, identical (the
+    sequences are the same) and single (the original has one unique character, so it
+    is not checked for identity). The few pairs with non-ASCII bytes, where bytes
+    aren't characters, are checked by verify_read instead.
+    """
+    width = max(map(len, original_seqs + shuffled_seqs), default=0)
+    original_lengths, original = pad_sequences(original_seqs, width)
+    shuffled_lengths, shuffled = pad_sequences(shuffled_seqs, width)
+    original_counts = composition_matrix(original, original_lengths)
+    composition_matches = (original_counts == composition_matrix(shuffled, shuffled_lengths)).all(axis=1)
     
-    # Generate output filename if not provided, or use default naming in specified directory
-    if args.output is None:
-        shuffled_base = Path(args.shuffled_file).stem
-        args.output = f"{shuffled_base}_verification_results.tsv"
+    # Padding lines up wherever the lengths match
+    identical = (original_lengths == shuffled_lengths) & (original == shuffled).all(axis=1)
+    
+    # One unique character is all one base, or all other characters, which are checked singly
+    nonempty = original_lengths > 0
+    single = nonempty & (original_counts[:, :-1].max(axis=1) == original_lengths)
+    for i in np.flatnonzero(nonempty & (original_counts[:, -1] == original_lengths)):
+        single[i] = has_single_unique_character(original_seqs[i].decode())
+    
+    passed = composition_matches & (single | ~identical)
+    
+    if width and max(original.max(), shuffled.max()) >= 0x80:
+        non_ascii = (original >= 0x80).any(axis=1) | (shuffled >= 0x80).any(axis=1)
+        for i in np.flatnonzero(non_ascii):
+            result = verify_read(None, original_seqs[i].decode(), shuffled_seqs[i].decode())
+            passed[i] = result['pass_fail'] == "PASS"
+            single[i] = result['sequences_identical'] == "N/A"
+    return passed, identical, single
+
+
+def verify_read(read_name, original_seq, shuffled_seq):
+    """Compare one read's original and shuffled sequence (None if not found), returning a result row"""
+    if shuffled_seq is None:
+        print(f"WARNING: Read {read_name} not found in shuffled file", file=sys.stderr)
+        shuffled_seq = "not found"
+        original_counts = count_nucleotides(original_seq)
+        shuffled_counts = {'A': 0, 'C': 0, 'G': 0, 'T': 0, 'N': 0, 'other': 0}
+        sequences_identical = "N/A"
+        pass_fail = "FAIL"
     else:
-        # Check if output is a directory
-        output_path = Path(args.output)
-        if output_path.is_dir():
-            shuffled_base = Path(args.shuffled_file).stem
-            default_filename = f"{shuffled_base}_verification_results.tsv"
-            args.output = str(output_path / default_filename)
+        original_counts = count_nucleotides(original_seq)
+        shuffled_counts = count_nucleotides(shuffled_seq)
+        
+        # Check for composition match first
+        composition_matches = original_counts == shuffled_counts
+        
+        # Check if sequences are identical, but only if more than one unique character
+        if has_single_unique_character(original_seq):
+            sequences_identical = "N/A"
+        elif original_seq == shuffled_seq:
+            sequences_identical = "TRUE"
+        else:
+            sequences_identical = "FALSE"
+        
+        # Identical sequences should fail; don't fail for identity when only one unique character
+        if composition_matches and sequences_identical != "TRUE":
+            pass_fail = "PASS"
+        else:
+            pass_fail = "FAIL"
+    
+    return {
+        'read_name': read_name,
+        'original_seq': original_seq,
+        'original_counts': original_counts,
+        'shuffled_seq': shuffled_seq,
+        'shuffled_counts': shuffled_counts,
+        'sequences_identical': sequences_identical,
+        'pass_fail': pass_fail
+    }
+
+
+def print_detailed_report(result):
+    """Print the detailed report for one read to stderr"""
+    original_counts = result['original_counts']
+    shuffled_counts = result['shuffled_counts']
+    print("\n=== DETAILED REPORT FOR RANDOMLY SELECTED READ ===", file=sys.stderr)
+    print(f"Read name: {result['read_name']}", file=sys.stderr)
+    print(f"Original sequence: {result['original_seq']}", file=sys.stderr)
+    print(f"Original nucleotide counts: A={original_counts['A']}, C={original_counts['C']}, G={original_counts['G']}, T={original_counts['T']}, N={original_counts['N']}, other={original_counts['other']}", file=sys.stderr)
+    print(f"Shuffled sequence: {result['shuffled_seq']}", file=sys.stderr)
+    if result['shuffled_seq'] != "not found":
+        print(f"Shuffled nucleotide counts: A={shuffled_counts['A']}, C={shuffled_counts['C']}, G={shuffled_counts['G']}, T={shuffled_counts['T']}, N={shuffled_counts['N']}, other={shuffled_counts['other']}", file=sys.stderr)
+        print(f"Sequences identical: {result['sequences_identical']}", file=sys.stderr)
+    print(f"Result: {result['pass_fail']}", file=sys.stderr)
+    print("=" * 50, file=sys.stderr)
+
+
+def write_results_header(f):
+    """Write the header line of the results table"""
+    f.write("read_name\toriginal_sequence\tAs.original\tCs.original\tGs.original\tTs.original\tNs.original\tother.original\t")
+    f.write("shuffled_sequence\tAs.shuffled\tCs.shuffled\tGs.shuffled\tTs.shuffled\tNs.shuffled\tother.shuffled\tsequences_identical\tpass.fail\n")
+
+
+def write_result(f, result):
+    """Write one read's row of the results table"""
+    f.write(f"{result['read_name']}\t")
+    f.write(f"{result['original_seq']}\t")
+    for base in ('A', 'C', 'G', 'T', 'N', 'other'):
+        f.write(f"{result['original_counts'][base]}\t")
+    f.write(f"{result['shuffled_seq']}\t")
+    for base in ('A', 'C', 'G', 'T', 'N', 'other'):
+        f.write(f"{result['shuffled_counts'][base]}\t")
+    f.write(f"{result['sequences_identical']}\t")
+    f.write(f"{result['pass_fail']}\n")
+
+
+def tally_result(tally, result):
+    """Count a result towards the final summary"""
+    tally[result['pass_fail']] += 1
+    if result['sequences_identical'] == "TRUE":
+        tally['identical'] += 1
+    elif result['sequences_identical'] == "FALSE":
+        tally['different'] += 1
+    elif result['shuffled_seq'] != "not found":
+        tally['not_checked'] += 1
+
+
+def print_summary(tally, tested, output):
+    """Print the final summary to stderr"""
+    print(f"\n=== FINAL SUMMARY ===", file=sys.stderr)
+    print(f"Total reads tested: {tested}", file=sys.stderr)
+    print(f"Passed: {tally['PASS']}", file=sys.stderr)
+    print(f"Failed: {tally['FAIL']}", file=sys.stderr)
+    
+    # If there were identical sequences, provide detailed breakdown
+    if tally['identical'] > 0:
+        print(f"\n=== IDENTITY CHECK SUMMARY ===", file=sys.stderr)
+        print(f"Reads not checked for identity (single unique character): {tally['not_checked']}", file=sys.stderr)
+        print(f"Reads found to be identical to original: {tally['identical']}", file=sys.stderr)
+        print(f"Reads checked and found different from original: {tally['different']}", file=sys.stderr)
+        print(f"NOTE: Identical sequences are considered test failures", file=sys.stderr)
+    
+    print(f"Results written to: {output}", file=sys.stderr)
+
+
+def verify_sample(args):
+    """Test a random sample of num_reads reads, returning the tally
+    
+    One pass over the original file picks the reads and one over the shuffled file
+    finds them, so only the sampled reads are ever held in memory. With --index, a
+    file with a sidecar index is not read through at all: the reads are fetched by offset.
+    """
+    original_index = open_index(args.original_file) if args.index else None
+    shuffled_index = open_index(args.shuffled_file) if args.index else None
     
     print(f"Loading original file: {args.original_file}", file=sys.stderr)
-    original_reads = parse_fastq(args.original_file)
+    if original_index is not None:
+        with original_index:
+            original_reads, original_total = sample_indexed_reads(original_index, args.num_reads)
+    else:
+        original_reads, original_total = sample_reads(args.original_file, args.num_reads)
     
     print(f"Loading shuffled file: {args.shuffled_file}", file=sys.stderr)
-    shuffled_reads = parse_fastq(args.shuffled_file)
+    if shuffled_index is not None:
+        with shuffled_index:
+            shuffled_reads, shuffled_total = find_indexed_reads(shuffled_index, original_reads.keys())
+    else:
+        shuffled_reads, shuffled_total = find_reads(args.shuffled_file, original_reads.keys())
     
-    print(f"Original file contains {len(original_reads)} reads", file=sys.stderr)
-    print(f"Shuffled file contains {len(shuffled_reads)} reads", file=sys.stderr)
+    print(f"Original file contains {original_total} reads", file=sys.stderr)
+    print(f"Shuffled file contains {shuffled_total} reads", file=sys.stderr)
     
     # Determine number of reads to test
-    max_reads = min(len(original_reads), args.num_reads)
-    if args.num_reads > len(original_reads):
-        print(f"Requested {args.num_reads} reads, but only {len(original_reads)} available. Testing all reads.", file=sys.stderr)
+    max_reads = len(original_reads)
+    if args.num_reads > original_total:
+        print(f"Requested {args.num_reads} reads, but only {original_total} available. Testing all reads.", file=sys.stderr)
     
-    # Randomly select reads to test
-    read_names_to_test = random.sample(list(original_reads.keys()), max_reads)
+    # Test the sampled reads in random order
+    read_names_to_test = list(original_reads)
+    random.shuffle(read_names_to_test)
     
     print(f"Testing {max_reads} randomly selected reads", file=sys.stderr)
     
     # Select one read for detailed report
     detailed_read = random.choice(read_names_to_test)
     
-    # Track results
-    results = []
-    passed = 0
-    failed = 0
-    identical_sequences = 0
-    not_checked_for_identity = 0
-    checked_and_different = 0
-    
     # Test each selected read
+    tally = Counter()
+    results = []
     for i, read_name in enumerate(read_names_to_test):
         if (i + 1) % 100 == 0:
             print(f"Progress: {i + 1}/{max_reads} reads processed", file=sys.stderr)
         
-        original_seq = original_reads[read_name]
-        
-        # Check if read exists in shuffled file
-        if read_name not in shuffled_reads:
-            print(f"WARNING: Read {read_name} not found in shuffled file", file=sys.stderr)
-            shuffled_seq = "not found"
-            original_counts = count_nucleotides(original_seq)
-            shuffled_counts = {'A': 0, 'C': 0, 'G': 0, 'T': 0, 'N': 0, 'other': 0}
-            sequences_identical = "N/A"
-            pass_fail = "FAIL"
-            failed += 1
-        else:
-            shuffled_seq = shuffled_reads[read_name]
-            original_counts = count_nucleotides(original_seq)
-            shuffled_counts = count_nucleotides(shuffled_seq)
-            
-            # Check for composition match first
-            composition_matches = sequences_match_composition(original_seq, shuffled_seq)
-            
-            # Check if sequences are identical, but only if more than one unique character
-            if has_single_unique_character(original_seq):
-                sequences_identical = "N/A"
-                not_checked_for_identity += 1
-                # Don't fail for identity when only one unique character
-                if composition_matches:
-                    pass_fail = "PASS"
-                    passed += 1
-                else:
-                    pass_fail = "FAIL"
-                    failed += 1
-            else:
-                # Check if sequences are identical
-                if original_seq == shuffled_seq:
-                    sequences_identical = "TRUE"
-                    identical_sequences += 1
-                    pass_fail = "FAIL"  # Identical sequences should fail
-                    failed += 1
-                else:
-                    sequences_identical = "FALSE"
-                    checked_and_different += 1
-                    if composition_matches:
-                        pass_fail = "PASS"
-                        passed += 1
-                    else:
-                        pass_fail = "FAIL"
-                        failed += 1
-        
-        # Store result
-        results.append({
-            'read_name': read_name,
-            'original_seq': original_seq,
-            'original_counts': original_counts,
-            'shuffled_seq': shuffled_seq,
-            'shuffled_counts': shuffled_counts,
-            'sequences_identical': sequences_identical,
-            'pass_fail': pass_fail
-        })
+        result = verify_read(read_name, original_reads[read_name], shuffled_reads.get(read_name))
+        tally_result(tally, result)
+        results.append(result)
         
         # Print detailed report for selected read
         if read_name == detailed_read:
-            print("\n=== DETAILED REPORT FOR RANDOMLY SELECTED READ ===", file=sys.stderr)
-            print(f"Read name: {read_name}", file=sys.stderr)
-            print(f"Original sequence: {original_seq}", file=sys.stderr)
-            print(f"Original nucleotide counts: A={original_counts['A']}, C={original_counts['C']}, G={original_counts['G']}, T={original_counts['T']}, N={original_counts['N']}, other={original_counts['other']}", file=sys.stderr)
-            print(f"Shuffled sequence: {shuffled_seq}", file=sys.stderr)
-            if shuffled_seq != "not found":
-                print(f"Shuffled nucleotide counts: A={shuffled_counts['A']}, C={shuffled_counts['C']}, G={shuffled_counts['G']}, T={shuffled_counts['T']}, N={shuffled_counts['N']}, other={shuffled_counts['other']}", file=sys.stderr)
-                print(f"Sequences identical: {sequences_identical}", file=sys.stderr)
-            print(f"Result: {pass_fail}", file=sys.stderr)
-            print("=" * 50, file=sys.stderr)
+            print_detailed_report(result)
     
     # Write results table
     print(f"\nWriting results to: {args.output}", file=sys.stderr)
     with open(args.output, 'w') as f:
-        # Write header
-        f.write("read_name\toriginal_sequence\tAs.original\tCs.original\tGs.original\tTs.original\tNs.original\tother.original\t")
-        f.write("shuffled_sequence\tAs.shuffled\tCs.shuffled\tGs.shuffled\tTs.shuffled\tNs.shuffled\tother.shuffled\tsequences_identical\tpass.fail\n")
-        
-        # Write data
+        write_results_header(f)
         for result in results:
-            f.write(f"{result['read_name']}\t")
-            f.write(f"{result['original_seq']}\t")
-            f.write(f"{result['original_counts']['A']}\t")
-            f.write(f"{result['original_counts']['C']}\t")
-            f.write(f"{result['original_counts']['G']}\t")
-            f.write(f"{result['original_counts']['T']}\t")
-            f.write(f"{result['original_counts']['N']}\t")
-            f.write(f"{result['original_counts']['other']}\t")
-            f.write(f"{result['shuffled_seq']}\t")
-            f.write(f"{result['shuffled_counts']['A']}\t")
-            f.write(f"{result['shuffled_counts']['C']}\t")
-            f.write(f"{result['shuffled_counts']['G']}\t")
-            f.write(f"{result['shuffled_counts']['T']}\t")
-            f.write(f"{result['shuffled_counts']['N']}\t")
-            f.write(f"{result['shuffled_counts']['other']}\t")
-            f.write(f"{result['sequences_identical']}\t")
-            f.write(f"{result['pass_fail']}\n")
-    
-    # Print final summary to stderr
-    print(f"\n=== FINAL SUMMARY ===", file=sys.stderr)
-    print(f"Total reads tested: {max_reads}", file=sys.stderr)
-    print(f"Passed: {passed}", file=sys.stderr)
-    print(f"Failed: {failed}", file=sys.stderr)
+            write_result(f, result)
     
-    # If there were identical sequences, provide detailed breakdown
-    if identical_sequences > 0:
-        print(f"\n=== IDENTITY CHECK SUMMARY ===", file=sys.stderr)
-        print(f"Reads not checked for identity (single unique character): {not_checked_for_identity}", file=sys.stderr)
-        print(f"Reads found to be identical to original: {identical_sequences}", file=sys.stderr)
-        print(f"Reads checked and found different from original: {checked_and_different}", file=sys.stderr)
-        print(f"NOTE: Identical sequences are considered test failures", file=sys.stderr)
+    print_summary(tally, max_reads, args.output)
+    return tally
+
+
+def verify_batch(batch, tally, f):
+    """Test a batch of (read_name, original_seq, shuffled_seq) with both sequences as bytes
+    
+    The batch is tallied and its failed reads written to the results table f. With
+    NumPy the whole batch is checked at once by check_read_batch, and only failed reads
+    go through verify_read to build their rows.
+    """
+    if np is None:
+        for read_name, original_seq, shuffled_seq in batch:
+            result = verify_read(read_name, original_seq.decode(), shuffled_seq.decode())
+            tally_result(tally, result)
+            if result['pass_fail'] == "FAIL":
+                write_result(f, result)
+        return
+    
+    names, original_seqs, shuffled_seqs = zip(*batch)
+    passed, identical, single = check_read_batch(original_seqs, shuffled_seqs)
+    tally['PASS'] += int(passed.sum())
+    tally['FAIL'] += int(len(batch) - passed.sum())
+    tally['identical'] += int((identical & ~single).sum())
+    tally['different'] += int((~identical & ~single).sum())
+    tally['not_checked'] += int(single.sum())
+    for i in np.flatnonzero(~passed):
+        write_result(f, verify_read(names[i], original_seqs[i].decode(), shuffled_seqs[i].decode()))
+
+
+def verify_all(args):
+    """Stream both files and test every read, returning the tally
     
-    print(f"Results written to: {args.output}", file=sys.stderr)
+    Only failed reads are written to the results table, so neither memory nor the
+    table grows with the size of the files. Reads are tested in batches of up to
+    BATCH_BYTES of sequence.
+    """
+    print(f"Streaming {args.original_file} and {args.shuffled_file}, testing every read", file=sys.stderr)
+    
+    tally = Counter()
+    tested = 0
+    detailed = None
+    batch = []
+    width = 0
+    
+    def flush():
+        """Test the batch, keeping one of its reads as the detailed one with chance len(batch)/tested"""
+        nonlocal tested, detailed, width
+        verify_batch(batch, tally, f)
+        tested += len(batch)
+        if random.randrange(tested) < len(batch):
+            read_name, original_seq, shuffled_seq = random.choice(batch)
+            detailed = verify_read(read_name, original_seq.decode(), shuffled_seq.decode())
+        if tested // 1000000 > (tested - len(batch)) // 1000000:
+            print(f"Progress: {tested} reads processed", file=sys.stderr)
+        batch.clear()
+        width = 0
+    
+    print(f"Writing failed reads to: {args.output}", file=sys.stderr)
+    with open(args.output, 'w') as f:
+        write_results_header(f)
+        for read_name, original_seq, shuffled_seq in stream_read_pairs(args.original_file, args.shuffled_file,
+                                                                        args.max_pending):
+            if original_seq is None:
+                print(f"WARNING: Read {read_name} is only in the shuffled file", file=sys.stderr)
+                tally['extra'] += 1
+                continue
+            
+            if shuffled_seq is None:
+                # Reads missing from the shuffled file only turn up at the end, so test them singly
+                if batch:
+                    flush()
+                result = verify_read(read_name, original_seq.decode(), None)
+                tally_result(tally, result)
+                write_result(f, result)
+                tested += 1
+                if random.randrange(tested) == 0:
+                    detailed = result
+                continue
+            
+            # Sequences are padded to the batch's longest, so it is cut by padded size
+            longest = max(len(original_seq), len(shuffled_seq))
+            if batch and (len(batch) + 1) * max(width, longest) > BATCH_BYTES:
+                flush()
+            batch.append((read_name, original_seq, shuffled_seq))
+            width = max(width, longest)
+        if batch:
+            flush()
+    
+    if detailed is not None:
+        print_detailed_report(detailed)
+    if tally['extra']:
+        print(f"\nFAIL: {tally['extra']} reads in the shuffled file are not in the original file", file=sys.stderr)
+    print_summary(tally, tested, args.output)
+    return tally
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Verify FASTQ shuffling tool preserves nucleotide counts"
+    )
+    parser.add_argument("-v", "--version", action="version", version=f"fastq_verify.py {__version__}")
+    parser.add_argument("original_file", help="Original FASTQ file")
+    parser.add_argument("shuffled_file", help="Shuffled FASTQ file")
+    parser.add_argument("-n", "--num_reads", type=int, default=100, help="Number of reads to test (default: 100)")
+    parser.add_argument("-a", "--all", action="store_true",
+                        help="Test every read, streaming both files side by side instead of loading them; "
+                             "only failed reads go in the output table")
+    parser.add_argument("--max-pending", type=int, default=1000000,
+                        help="With --all, the most reads held in memory while the files' read orders differ "
+                             "(default: 1000000)")
+    parser.add_argument("-i", "--index", action="store_true",
+                        help="Fetch the sampled reads through a sidecar index (FILE.fxi), built on first use "
+                             "and reused while the file is unchanged; gzipped files must be BGZF")
+    parser.add_argument("-o", "--output", help="Output table filename")
+    
+    # Check if no arguments provided and show help
+    if len(sys.argv) == 1:
+        parser.print_help(sys.stderr)
+        sys.exit(2)
+    
+    args = parser.parse_args()
+    
+    # Generate output filename if not provided, or use default naming in specified directory
+    if args.output is None:
+        shuffled_base = Path(args.shuffled_file).stem
+        args.output = f"{shuffled_base}_verification_results.tsv"
+    else:
+        # Check if output is a directory
+        output_path = Path(args.output)
+        if output_path.is_dir():
+            shuffled_base = Path(args.shuffled_file).stem
+            default_filename = f"{shuffled_base}_verification_results.tsv"
+            args.output = str(output_path / default_filename)
+    
+    if args.all:
+        try:
+            tally = verify_all(args)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            print("FAIL")
+            sys.exit(1)
+    else:
+        tally = verify_sample(args)
     
     # Print pass/fail result to stdout
-    if failed == 0:
+    if tally['FAIL'] == 0 and tally['extra'] == 0:
         print("PASS")
         sys.exit(0)
     else:
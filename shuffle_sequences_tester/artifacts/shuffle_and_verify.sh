@@ -15,7 +15,7 @@ for i in {1..5}; do
     python resource/shuffle_claude.py $INPUT_FILE temp/shuffled_${i}.fastq
     
     # Run verification script  
-    python artifacts/fastq_verify.py $INPUT_FILE temp/shuffled_${i}.fastq_k1.fastq -o output/
+    python artifacts/fastq_verify.py $INPUT_FILE temp/shuffled_${i}.fastq_k1.fastq.gz -o output/
     
     echo "Completed iteration $i"
 done
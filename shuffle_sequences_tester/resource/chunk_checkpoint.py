@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Chunk-level checkpointing for the shuffle scripts, so a preempted or timed-out job
+can be rerun and pick up where it stopped.
+
+The outputs are written one chunk at a time, in input order. After each chunk's
+compressed blocks are on disk (flushed and fsynced), a line is appended to a JSON
+lines manifest next to the first output, recording the chunk's end in the input
+(uncompressed byte offset and read count) and, for every output, its size and the
+CRC32 of the chunk's bytes. The BGZF end-of-file marker is only written once the
+whole input is done, and the manifest is then deleted, so running the same command
+after a finished run starts over and overwrites the outputs.
+
+The manifest's first line holds the run's settings (input, seed, k values, chunk
+size...). On a rerun with the same settings, the committed chunks are checked
+against their checksums, anything written after the last commit is cut off, and
+the caller skips that many reads of input and appends the rest. A rerun with
+different settings is refused rather than mixing the two runs' output.
+"""
+
+import json
+import os
+import zlib
+
+MANIFEST_SUFFIX = '.manifest'
+
+
+def file_identity(path):
+    """Size and modification time of a file, to tell if an input changed between runs."""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class ChunkCheckpoint:
+    """Append-only writer for a set of outputs, with a manifest entry for every chunk committed.
+
+    Use as a context manager; after entering, reads and input_offset say how much of
+    the input the existing outputs already cover (0 for a fresh run). settings (a
+    JSON-serialisable dict) must match the previous run's for it to be resumed.
+    """
+
+    def __init__(self, output_files, settings, manifest_file=None):
+        self.output_files = list(output_files)
+        self.settings = settings
+        self.manifest_file = manifest_file or self.output_files[0] + MANIFEST_SUFFIX
+        self.chunks = 0
+        self.reads = 0
+        self.input_offset = 0
+        self.sizes = [0] * len(self.output_files)
+        self.entries = []
+        self.outputs = []
+        self.manifest = None
+
+    def __enter__(self):
+        # A manifest whose outputs have all been deleted is a run to start again from scratch
+        if os.path.exists(self.manifest_file) and any(map(os.path.exists, self.output_files)):
+            self._load()
+            mode = 'r+b'
+        else:
+            mode = 'wb'
+        try:
+            self.outputs = [open(path, mode) for path in self.output_files]
+            for index, (output, size) in enumerate(zip(self.outputs, self.sizes)):
+                self._verify(index)
+                output.truncate(size)
+                output.seek(size)
+            if mode == 'wb':
+                self.manifest = open(self.manifest_file, 'w')
+                self._append({'settings': self.settings})
+            else:
+                self.manifest = open(self.manifest_file, 'a')
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for output in self.outputs:
+            output.close()
+        if self.manifest is not None:
+            self.manifest.close()
+
+    def _load(self):
+        """Read the manifest of a previous run, checking it was made with the same settings."""
+        with open(self.manifest_file) as f:
+            lines = f.read().split('\n')
+        entries = []
+        for number, line in enumerate(lines):
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A half-written last line is a commit that never finished; anything else is damage
+                if any(lines[number + 1:]):
+                    raise ValueError(f"{self.manifest_file}: line {number + 1} is not valid JSON")
+        previous = entries[0].get('settings') if entries else None
+        if previous != self.settings:
+            if isinstance(previous, dict):
+                changed = ', '.join(sorted(key for key in previous.keys() | self.settings.keys()
+                                           if previous.get(key) != self.settings.get(key)))
+            else:
+                changed = 'settings'
+            raise ValueError(f"{self.manifest_file} is from a run with different {changed}; "
+                             f"rerun with the same arguments, or delete it and its outputs to start over")
+        missing = [path for path in self.output_files if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"{missing[0]} is missing; delete {self.manifest_file} "
+                             f"and its outputs to start over")
+        self.entries = entries[1:]
+        for entry in self.entries:
+            self.chunks = entry['chunk'] + 1
+            self.reads = entry['reads']
+            self.input_offset = entry['input_offset']
+            self.sizes = [size for size, _ in entry['outputs']]
+
+    def _verify(self, index):
+        """Check the chunks committed to one output against their checksums."""
+        output = self.outputs[index]
+        output.seek(0, os.SEEK_END)
+        if output.tell() < self.sizes[index]:
+            raise ValueError(f"{self.output_files[index]} is shorter than its manifest says; "
+                             f"delete it and {self.manifest_file} to start over")
+        output.seek(0)
+        start = 0
+        for entry in self.entries:
+            end, crc = entry['outputs'][index]
+            if zlib.crc32(output.read(end - start)) != crc:
+                raise ValueError(f"{self.output_files[index]}: chunk {entry['chunk']} does not match "
+                                 f"its checksum in {self.manifest_file}")
+            start = end
+
+    def _append(self, entry):
+        """Add a line to the manifest and make sure it is on disk."""
+        self.manifest.write(json.dumps(entry) + '\n')
+        self.manifest.flush()
+        os.fsync(self.manifest.fileno())
+
+    def commit(self, blocks, reads, input_bytes):
+        """Append one chunk's compressed data (one bytes-like per output) and record it in the manifest."""
+        checksums = []
+        for output, data in zip(self.outputs, blocks):
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+            checksums.append(zlib.crc32(data))
+        self.reads += reads
+        self.input_offset += input_bytes
+        self.sizes = [size + len(data) for size, data in zip(self.sizes, blocks)]
+        self._append({'chunk': self.chunks, 'input_offset': self.input_offset, 'reads': self.reads,
+                      'outputs': [[size, crc] for size, crc in zip(self.sizes, checksums)]})
+        self.chunks += 1
+
+    def finish(self, trailer=b''):
+        """Write trailer (the BGZF EOF block) to every output and delete the manifest.
+
+        If the job dies before the manifest is gone, a rerun cuts the trailer off again,
+        finds no more input and rewrites it, so the outputs still come out whole.
+        """
+        for output in self.outputs:
+            output.write(trailer)
+            output.flush()
+            os.fsync(output.fileno())
+        self.manifest.close()
+        self.manifest = None
+        os.remove(self.manifest_file)
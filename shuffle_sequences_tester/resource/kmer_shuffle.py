@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Batched k-mer shuffling with NumPy, shared by shuffle_v3.py and shuffle_claude.py.
+
+A read is cut into non-overlapping k-mers from its start, the last one holding any
+remainder, and the k-mers are put back in a random order. Instead of a Python list
+and random.shuffle per read, reads are packed into a 2-D uint8 array, every row gets
+its own permutation of k-mer blocks (an argsort of random keys), and the bases (and
+qualities, if given) are gathered with one index array. Reads are batched by length;
+lengths too rare to fill a batch, as with merged pairs, are pooled with similar
+lengths and padded to the longest. The results are put back in input order.
+
+With a seed, the random keys come from a counter-based stream keyed by (seed, k,
+read number, k-mer number) instead of a Generator, so each read's shuffle depends
+only on its position in the file: the output is the same for any number of
+workers or chunk size, and a run can be restarted part way through.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+# SplitMix64 constants: the golden-ratio increment and the two finaliser multipliers
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+# Lengths with fewer reads than this in a batch are pooled with others within
+# LENGTH_BUCKET_WIDTH bases and shuffled as one padded batch
+MIN_LENGTH_BATCH = 64
+LENGTH_BUCKET_WIDTH = 64
+
+
+def _mix64(z):
+    """SplitMix64 finaliser: a bijective scramble of each uint64 in z."""
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+
+def read_keys(seed, stream, read_numbers, num_blocks):
+    """Return (len(read_numbers), num_blocks) uint64 random keys, a pure function of their inputs.
+
+    Each read gets its own key from (seed, stream, read number); its k-mers' keys are
+    that key hashed with the k-mer number, like a counter-based generator.
+    """
+    with np.errstate(over='ignore'):
+        read_numbers = np.asarray(read_numbers, dtype=np.uint64)
+        base = _mix64(np.uint64(seed & 0xFFFFFFFFFFFFFFFF) ^ _mix64(np.uint64(stream) * _GOLDEN))
+        read_key = _mix64(base ^ _mix64(read_numbers * _GOLDEN))
+        counters = np.arange(1, num_blocks + 1, dtype=np.uint64) * _GOLDEN
+        return _mix64(read_key[:, None] + counters)
+
+
+def kmer_permutations(lengths, k, rng=None, seed=None, read_numbers=None):
+    """Return (positions, valid) giving each read's shuffled k-mer order, for reads sorted by length.
+
+    Row r of positions lists, for each output position, the input position of read r
+    it takes its base from. Keys are drawn from rng, or with a seed from read_keys for
+    the given read numbers. If all the reads are the same length, positions is
+    (count, length) and valid is None. Otherwise both are padded to the longest read,
+    and valid marks the lengths[r] positions that fall inside read r: blocks past the
+    end of a read get the largest key, so they sort after its own blocks, whose order
+    is then the same as it would be in a batch of reads of just that length.
+    """
+    lengths = np.asarray(lengths)
+    width = int(lengths[-1])
+    num_blocks = -(-width // k)
+    positions = np.arange(num_blocks * k).reshape(num_blocks, k)
+    if seed is None:
+        keys = rng.random((len(lengths), num_blocks))
+    else:
+        keys = read_keys(seed, k, read_numbers, num_blocks)
+    padded = lengths[0] != width
+    if padded:
+        keys[np.arange(num_blocks) >= -(-lengths[:, None] // k)] = np.inf if seed is None else np.iinfo(np.uint64).max
+    order = np.argsort(keys, axis=1)
+    shuffled = positions[order].reshape(len(lengths), -1)
+    if padded:
+        return np.minimum(shuffled, width - 1), shuffled < lengths[:, None]
+    if width % k:
+        # The last block is short: drop the padding positions past the end of the read.
+        # Every row has the same number of them, so the rows stay the same length.
+        shuffled = shuffled[shuffled < width].reshape(len(lengths), width)
+    return shuffled, None
+
+
+def length_buckets(lengths, min_batch=MIN_LENGTH_BATCH, width=LENGTH_BUCKET_WIDTH):
+    """Split read indices into batches to shuffle together, each sorted by length.
+
+    A length shared by at least min_batch reads gets a batch of its own. The reads of
+    rarer lengths, as with merged pairs, are pooled in width-base ranges and padded to
+    the longest in their batch, which wastes fewer than width bases per read but saves
+    running many tiny batches.
+    """
+    order = np.argsort(lengths, kind='stable')
+    sorted_lengths = lengths[order]
+    _, first, counts = np.unique(sorted_lengths, return_index=True, return_counts=True)
+    common = np.repeat(counts >= min_batch, counts)
+    # Common lengths keep their own id; the rest share one per range, sorted after them
+    batch_ids = np.where(common, sorted_lengths, -1 - sorted_lengths // width)
+    regrouped = np.argsort(batch_ids, kind='stable')
+    order, batch_ids = order[regrouped], batch_ids[regrouped]
+    return np.split(order, np.flatnonzero(np.diff(batch_ids)) + 1)
+
+
+def shuffle_kmers(sequences, k, rng=None, qualities=None, seed=None, first_read=0):
+    """Shuffle the non-overlapping k-mers of each sequence (bytes), in batches by length.
+
+    Returns the shuffled sequences in input order, or (sequences, qualities) when
+    qualities are given, with each quality string moved the same way as its sequence.
+    Randomness comes from rng, or, given a seed, from read_keys with the sequences
+    numbered from first_read (their position in the whole file).
+    """
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+    if qualities is not None:
+        mismatched = np.flatnonzero(lengths != np.fromiter(map(len, qualities), dtype=np.int64,
+                                                           count=len(qualities)))
+        if len(mismatched):
+            i = mismatched[0]
+            raise ValueError(f"Read {i} has {len(sequences[i])} bases but {len(qualities[i])} quality scores")
+
+    shuffled_sequences = [None] * len(sequences)
+    shuffled_qualities = [None] * len(sequences) if qualities is not None else None
+    for indices in length_buckets(lengths):
+        if not len(indices):
+            continue  # No reads at all
+        batch_lengths = lengths[indices]
+        indices = indices.tolist()
+        if batch_lengths[-1] <= k:
+            # A single k-mer each: nothing to move
+            for i in indices:
+                shuffled_sequences[i] = sequences[i]
+                if qualities is not None:
+                    shuffled_qualities[i] = qualities[i]
+            continue
+
+        read_numbers = np.uint64(first_read) + np.array(indices, dtype=np.uint64) if seed is not None else None
+        positions, valid = kmer_permutations(batch_lengths, k, rng, seed, read_numbers)
+        # Reads of mixed lengths are packed into rows padded to the longest
+        in_read = np.arange(batch_lengths[-1]) < batch_lengths[:, None] if valid is not None else None
+        ends = np.cumsum(batch_lengths).tolist()
+        batches = [(sequences, shuffled_sequences)]
+        if qualities is not None:
+            batches.append((qualities, shuffled_qualities))
+        for source, destination in batches:
+            joined = np.frombuffer(b''.join(source[i] for i in indices), dtype=np.uint8)
+            if valid is None:
+                rows = np.take_along_axis(joined.reshape(positions.shape), positions, axis=1)
+            else:
+                packed = np.zeros(in_read.shape, dtype=np.uint8)
+                packed[in_read] = joined
+                # Each row's valid positions come out in order and add up to the read's length
+                rows = np.take_along_axis(packed, positions, axis=1)[valid]
+            rows = rows.tobytes()
+            start = 0
+            for i, end in zip(indices, ends):
+                destination[i] = rows[start:end]
+                start = end
+
+    if qualities is not None:
+        return shuffled_sequences, shuffled_qualities
+    return shuffled_sequences
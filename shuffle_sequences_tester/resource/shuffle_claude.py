@@ -5,15 +5,37 @@ Randomizes reads by shuffling non-overlapping k-mers for k=1 to 35
 Optimized for processing 50+ million reads using multiprocessing
 """
 
+import argparse
 import random
 import sys
 import os
+import threading
+import time
 from multiprocessing import Pool, cpu_count
 from functools import partial
-import gzip
+from pathlib import Path
 
-def randomize_kmers(sequence, quality, k):
-    """Shuffle non-overlapping k-mers in a sequence"""
+try:
+    from fastx_io import BGZF_EOF, compress_bgzf, fastq_blocks, iter_fastq_batches, split_fastq_block
+except ImportError:
+    # Running from a checkout without fastx_io installed: use the copy in the repository
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "fastx_io"))
+    from fastx_io import BGZF_EOF, compress_bgzf, fastq_blocks, iter_fastq_batches, split_fastq_block
+
+try:
+    import numpy as np
+    from kmer_shuffle import shuffle_kmers
+except ImportError:
+    np = None  # Without NumPy, reads are shuffled one at a time with randomize_kmers
+
+from chunk_checkpoint import ChunkCheckpoint, file_identity
+
+# Default chunk size for the 'chunk' method, in MB of FASTQ text (about 50,000 150 bp reads).
+# Chunks are cut by size rather than read count so workers get even loads with merged pairs.
+CHUNK_MB = 16
+
+def randomize_kmers(sequence, quality, k, rng=random):
+    """Shuffle non-overlapping k-mers in a sequence (sequence and quality are bytes)"""
     if len(sequence) < k:
         return sequence, quality
     
@@ -23,117 +45,143 @@ def randomize_kmers(sequence, quality, k):
     
     # Shuffle them together
     paired = list(zip(seq_kmers, qual_kmers))
-    random.shuffle(paired)
+    rng.shuffle(paired)
     
     # Reconstruct
     shuffled_seq, shuffled_qual = zip(*paired)
-    return ''.join(shuffled_seq), ''.join(shuffled_qual)
+    return b''.join(shuffled_seq), b''.join(shuffled_qual)
+
+def randomize_kmers_batch(records, k, rng=None, seed=None, first_read=0):
+    """Shuffle non-overlapping k-mers in a list of (header, sequence, plus, quality) records
+    
+    With a seed, each read's shuffle depends only on the seed, k and its read number in the
+    file (first_read is the number of the first record), not on how the file was split up.
+    """
+    def read_rng(i):
+        # A read shuffled on its own is seeded by its read number, so it too doesn't depend on the batch
+        return random if seed is None else random.Random(f"{seed}:{k}:{first_read + i}")
+    
+    if np is None:
+        shuffled = [randomize_kmers(sequence, quality, k, read_rng(i))
+                    for i, (_, sequence, _, quality) in enumerate(records)]
+        sequences = [sequence for sequence, _ in shuffled]
+        qualities = [quality for _, quality in shuffled]
+    else:
+        # randomize_kmers also copes with quality strings that don't match their sequence, so
+        # those reads alone are shuffled one at a time; the rest are unaffected by them
+        qualities = [record[3] for record in records]
+        mismatched = [i for i, (_, sequence, _, quality) in enumerate(records) if len(sequence) != len(quality)]
+        for i in mismatched:
+            qualities[i] = records[i][1]  # A stand-in of the right length; replaced below
+        
+        # One vectorised shuffle per read length instead of one Python shuffle per read
+        if seed is None and rng is None:
+            rng = np.random.default_rng()
+        sequences, qualities = shuffle_kmers([record[1] for record in records], k, rng,
+                                             qualities, seed, first_read)
+        for i in mismatched:
+            _, sequence, _, quality = records[i]
+            sequences[i], qualities[i] = randomize_kmers(sequence, quality, k, read_rng(i))
+    return [(header, sequence, plus, quality)
+            for (header, _, plus, _), sequence, quality in zip(records, sequences, qualities)]
 
 def process_reads_for_k(args):
     """Process all reads for a specific k-mer size"""
-    k, input_file, output_base, chunk_size = args
+    k, input_file, output_base, chunk_size, seed = args
     
-    output_file = f"{output_base}_k{k}.fastq"
+    output_file = output_path(output_base, k)
     print(f"Processing k={k}...")
     
-    opener = gzip.open if input_file.endswith('.gz') else open
-    mode = 'rt' if input_file.endswith('.gz') else 'r'
-    
     reads_processed = 0
+    rng = np.random.default_rng() if np is not None else None
     
-    with opener(input_file, mode) as infile, open(output_file, 'w') as outfile:
-        while True:
-            # Read one record at a time
-            header = infile.readline().strip()
-            if not header:
-                break
-                
-            sequence = infile.readline().strip()
-            plus = infile.readline().strip()
-            quality = infile.readline().strip()
-            
-            # Process this read
-            rand_seq, rand_qual = randomize_kmers(sequence, quality, k)
+    with open(output_file, 'wb') as outfile:
+        for batch in iter_fastq_batches(input_file):
+            # Process a block of reads at a time
+            shuffled = randomize_kmers_batch(batch, k, rng, seed, reads_processed)
             
             # Write result
-            outfile.write(f"{header}\n{rand_seq}\n{plus}\n{rand_qual}\n")
+            outfile.write(compress_bgzf(b''.join(b"%s\n%s\n%s\n%s\n" % record for record in shuffled)))
             
-            reads_processed += 1
-            if reads_processed % 1000000 == 0:
-                print(f"  k={k}: Processed {reads_processed:,} reads")
+            previous = reads_processed
+            reads_processed += len(batch)
+            if reads_processed // 1000000 > previous // 1000000:
+                print(f"  k={k}: Processed {reads_processed // 1000000 * 1000000:,} reads")
+        
+        outfile.write(BGZF_EOF)
     
     print(f"Completed k={k} - Total reads: {reads_processed:,}")
     return k, reads_processed
 
 def process_chunk_for_all_k(args):
-    """Process a chunk of reads for all k values (alternative approach)"""
-    chunk_data, k_values, output_base, chunk_id = args
-    
-    # Dictionary to store results for each k
-    results = {k: [] for k in k_values}
-    
-    # Process each read in the chunk for all k values
-    for header, sequence, plus, quality in chunk_data:
-        for k in k_values:
-            rand_seq, rand_qual = randomize_kmers(sequence, quality, k)
-            results[k].append((header, rand_seq, plus, rand_qual))
+    """Shuffle a chunk of reads for every k value, returning (one compressed FASTQ block per k, reads, input bytes, seconds)"""
+    chunk_data, k_values, seed, first_read = args
+    start_time = time.perf_counter()
     
-    # Write results to temporary files
-    temp_files = {}
+    # The chunk was read and decompressed once; every k is made from it here
+    rng = np.random.default_rng() if np is not None else None
+    compressed = []
     for k in k_values:
-        temp_file = f"{output_base}_k{k}_chunk{chunk_id}.tmp"
-        temp_files[k] = temp_file
-        
-        with open(temp_file, 'w') as f:
-            for header, sequence, plus, quality in results[k]:
-                f.write(f"{header}\n{sequence}\n{plus}\n{quality}\n")
-    
-    return temp_files
+        shuffled = randomize_kmers_batch(chunk_data, k, rng, seed, first_read)
+        compressed.append(compress_bgzf(b''.join(b"%s\n%s\n%s\n%s\n" % record for record in shuffled)))
+    return compressed, len(chunk_data), record_bytes(chunk_data), time.perf_counter() - start_time
 
-def read_fastq_chunks(filename, chunk_size=50000):
-    """Generator that yields chunks of FASTQ reads"""
-    opener = gzip.open if filename.endswith('.gz') else open
-    mode = 'rt' if filename.endswith('.gz') else 'r'
+def record_bytes(records):
+    """Size of (header, sequence, plus, quality) records as FASTQ text, to record input offsets"""
+    return sum(len(header) + len(sequence) + len(plus) + len(quality) + 4
+               for header, sequence, plus, quality in records)
+
+def read_fastq_chunks(filename, chunk_bytes=CHUNK_MB * 1000000, skip=0, skip_bytes=0, chunk_reads=None):
+    """Generator that yields chunks of about chunk_bytes of FASTQ reads (plain or gzipped)
+    as lists of (header, sequence, plus, quality) bytes
     
+    If chunk_reads is given, chunks are exactly chunk_reads reads instead.
+    The first skip reads are left out; they must come to skip_bytes of FASTQ, as a check
+    that the input is the one a resumed run started on.
+    """
     chunk = []
-    with opener(filename, mode) as f:
-        while True:
-            header = f.readline().strip()
-            if not header:
-                if chunk:
-                    yield chunk
-                break
-            
-            sequence = f.readline().strip()
-            plus = f.readline().strip()
-            quality = f.readline().strip()
-            
-            chunk.append((header, sequence, plus, quality))
-            
-            if len(chunk) >= chunk_size:
-                yield chunk
-                chunk = []
+    chunk_size = 0
+    skipped_bytes = 0
+    for block in fastq_blocks(filename):
+        batch = split_fastq_block(block)
+        if skip:
+            skipped_bytes += record_bytes(batch[:skip])
+            skip, batch = max(skip - len(batch), 0), batch[skip:]
+            if not skip and skipped_bytes != skip_bytes:
+                raise ValueError(f"The reads already done took {skipped_bytes} bytes of input, "
+                                 f"not {skip_bytes} as recorded: has the input changed?")
+            block_size = record_bytes(batch)
+        else:
+            block_size = len(block)
+        chunk.extend(batch)
+        if chunk_reads:
+            start = 0
+            while len(chunk) - start >= chunk_reads:
+                yield chunk[start:start + chunk_reads]
+                start += chunk_reads
+            chunk = chunk[start:]
+            continue
+        chunk_size += block_size
+        if chunk_size >= chunk_bytes:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+    if skip:
+        raise ValueError("The input has fewer reads than were already done: has it changed?")
+    if chunk:
+        yield chunk
 
-def merge_temp_files(output_base, k_values, num_chunks):
-    """Merge temporary chunk files into final outputs"""
-    for k in k_values:
-        output_file = f"{output_base}_k{k}.fastq"
-        with open(output_file, 'w') as outfile:
-            for chunk_id in range(num_chunks):
-                temp_file = f"{output_base}_k{k}_chunk{chunk_id}.tmp"
-                if os.path.exists(temp_file):
-                    with open(temp_file, 'r') as infile:
-                        outfile.write(infile.read())
-                    os.remove(temp_file)
-        print(f"Merged k={k}")
-
-def process_by_k_parallel(input_file, output_base, max_processes):
+def output_path(output_base, k):
+    """Name of the compressed output file for one k-mer size"""
+    return f"{output_base}_k{k}.fastq.gz"
+
+def process_by_k_parallel(input_file, output_base, max_processes, seed=None):
     """Process by parallelizing across k values (simpler, no nested pools)"""
     k_values = list(range(1, 36))
     chunk_size = 100000  # Not used in this approach, but kept for consistency
     
     # Create arguments for each k value
-    args_list = [(k, input_file, output_base, chunk_size) for k in k_values]
+    args_list = [(k, input_file, output_base, chunk_size, seed) for k in k_values]
     
     print(f"Processing k=1 to 35 in parallel using {max_processes} processes")
     
@@ -142,55 +190,135 @@ def process_by_k_parallel(input_file, output_base, max_processes):
     
     return results
 
-def process_by_chunks_parallel(input_file, output_base, chunk_size, max_processes):
-    """Process by parallelizing across chunks (more memory efficient for huge files)"""
+class StageTimer:
+    """Seconds spent and reads handled by each stage of the chunk pipeline, for reads/s reports"""
+    
+    def __init__(self, stages):
+        self.seconds = dict.fromkeys(stages, 0.0)
+        self.reads = dict.fromkeys(stages, 0)
+        self.start_time = time.perf_counter()
+    
+    def add(self, stage, reads, seconds):
+        self.seconds[stage] += seconds
+        self.reads[stage] += reads
+    
+    def report(self, workers):
+        """Print overall reads/s and each stage's reads/s over the time it was busy"""
+        elapsed = time.perf_counter() - self.start_time
+        written = self.reads['write']
+        print(f"  {written:,} reads in {elapsed:.1f}s ({written / elapsed:,.0f} reads/s overall)")
+        for stage, seconds in self.seconds.items():
+            rate = self.reads[stage] / seconds if seconds > 0 else 0
+            note = f" per worker, {rate * workers:,.0f} reads/s across {workers}" if stage == 'shuffle' else ""
+            print(f"    {stage:8s} {seconds:8.1f}s busy  {rate:12,.0f} reads/s{note}")
+
+def process_by_chunks_parallel(input_file, output_base, chunk_size, max_processes, report_every=1000000, seed=None,
+                               chunk_mb=CHUNK_MB):
+    """Process by parallelizing across chunks, making every k from a single pass over the input
+    
+    Chunks are chunk_size reads, or chunk_mb MB of FASTQ if chunk_size is None.
+    One pool runs for the whole file. It is fed through imap while the main process keeps
+    reading, with at most two chunks per worker read ahead of the writer, so reading,
+    shuffling and writing overlap without the input piling up in memory.
+    
+    Each chunk is committed to output_base.manifest once all 35 outputs have it on disk,
+    so a killed job run again with the same arguments carries on after the last chunk
+    committed (see chunk_checkpoint.py). The manifest is deleted once every output is finished.
+    """
     k_values = list(range(1, 36))
+    timer = StageTimer(['read', 'shuffle', 'write'])
+    in_flight = threading.BoundedSemaphore(max_processes * 2)
+    stopped = threading.Event()
+    settings = {'input': file_identity(input_file), 'k_values': k_values, 'chunk_size': chunk_size,
+                'chunk_mb': None if chunk_size else chunk_mb, 'seed': seed}
+    checkpoint = ChunkCheckpoint([output_path(output_base, k) for k in k_values], settings,
+                                 f"{output_base}.manifest")
     
-    print(f"Processing in chunks of {chunk_size:,} reads using {max_processes} processes")
+    if chunk_size:
+        print(f"Processing in chunks of {chunk_size:,} reads using {max_processes} processes")
+    else:
+        print(f"Processing in chunks of {chunk_mb:g} MB using {max_processes} processes")
     
-    # Process chunks in parallel
-    chunk_args = []
-    chunk_id = 0
+    def chunk_args(first_read, first_read_offset):
+        # Runs in the pool's task feeder thread; blocks while too many chunks are unwritten
+        chunks = read_fastq_chunks(input_file, int(chunk_mb * 1000000), first_read, first_read_offset, chunk_size)
+        while True:
+            # Give up waiting if the writer has stopped, or closing the pool would wait on this thread
+            while not in_flight.acquire(timeout=1):
+                if stopped.is_set():
+                    return
+            start_time = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            timer.add('read', len(chunk), time.perf_counter() - start_time)
+            yield chunk, k_values, seed, first_read
+            first_read += len(chunk)
     
-    for chunk in read_fastq_chunks(input_file, chunk_size):
-        chunk_args.append((chunk, k_values, output_base, chunk_id))
-        chunk_id += 1
+    # All 35 outputs stay open, and each chunk's blocks are appended to them in input order
+    with checkpoint:
+        if checkpoint.reads:
+            print(f"Resuming after {checkpoint.reads:,} reads ({checkpoint.chunks} chunks) already written")
         
-        # Process in batches to avoid memory issues
-        if len(chunk_args) >= max_processes:
-            with Pool(processes=max_processes) as pool:
-                pool.map(process_chunk_for_all_k, chunk_args)
-            chunk_args = []
-    
-    # Process remaining chunks
-    if chunk_args:
+        # Bound now: the feeder thread reads on while commits move the checkpoint along
+        tasks = chunk_args(checkpoint.reads, checkpoint.input_offset)
         with Pool(processes=max_processes) as pool:
-            pool.map(process_chunk_for_all_k, chunk_args)
+            try:
+                for compressed, reads, input_bytes, seconds in pool.imap(process_chunk_for_all_k, tasks):
+                    timer.add('shuffle', reads, seconds)
+                    start_time = time.perf_counter()
+                    checkpoint.commit(compressed, reads, input_bytes)
+                    timer.add('write', reads, time.perf_counter() - start_time)
+                    in_flight.release()
+
+                    if timer.reads['write'] // report_every > (timer.reads['write'] - reads) // report_every:
+                        timer.report(max_processes)
+            finally:
+                stopped.set()
+
+        checkpoint.finish(BGZF_EOF)
     
-    # Merge temporary files
-    print("Merging temporary files...")
-    merge_temp_files(output_base, k_values, chunk_id)
+    print("Throughput:")
+    timer.report(max_processes)
 
 def main():
-    if len(sys.argv) < 3 or len(sys.argv) > 6:
-        print("Usage: python script.py input.fastq output_base [max_processes] [method] [chunk_size]")
-        print("  input.fastq     - Input FASTQ file (can be .gz)")
-        print("  output_base     - Output base name")
-        print("  max_processes   - Max parallel processes (default: min(35, CPU_count))")
-        print("  method          - 'k' (parallel by k-mer) or 'chunk' (parallel by chunks)")
-        print("  chunk_size      - Reads per chunk for 'chunk' method (default: 50000)")
-        print()
-        print("Method 'k': Faster for smaller files, one process per k-mer size")
-        print("Method 'chunk': More memory efficient for huge files (50M+ reads)")
-        print()
-        print("Creates: output_base_k1.fastq, output_base_k2.fastq, ..., output_base_k35.fastq")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Shuffle the non-overlapping k-mers of every read, for k=1 to 35",
+        epilog="""
+Method 'chunk': Reads the input once and makes all 35 outputs from each chunk;
+                if killed, running it again carries on from output_base.manifest
+Method 'k': One process per k-mer size, each reading the whole input
+
+Creates: output_base_k1.fastq.gz, output_base_k2.fastq.gz, ..., output_base_k35.fastq.gz
+        """,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("input_file", help="Input FASTQ file (can be .gz)")
+    parser.add_argument("output_base", help="Output base name")
+    parser.add_argument("max_processes", nargs="?", type=int, default=min(35, cpu_count()),
+                        help="Max parallel processes (default: min(35, CPU_count))")
+    parser.add_argument("method", nargs="?", choices=["chunk", "k"], default="chunk",
+                        help="'chunk' (parallel by chunks, default) or 'k' (parallel by k-mer)")
+    parser.add_argument("chunk_size", nargs="?", type=int,
+                        help="Reads per chunk for 'chunk' method (default: chunks of --chunk-mb MB)")
+    parser.add_argument("--chunk-mb", type=float,
+                        help=f"MB of FASTQ per chunk for 'chunk' method, when no chunk_size is given "
+                             f"(default: {CHUNK_MB})")
+    parser.add_argument("--seed", type=int,
+                        help="Random seed. Each read's shuffle is derived from the seed, k and its position "
+                             "in the file, so the output is the same for any method, process count or chunk size")
+    args = parser.parse_args()
+    if args.chunk_size is not None and args.chunk_mb is not None:
+        parser.error("give either chunk_size or --chunk-mb, not both")
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("chunk_size must be at least 1")
     
-    input_file = sys.argv[1]
-    output_base = sys.argv[2]
-    max_processes = int(sys.argv[3]) if len(sys.argv) > 3 else min(35, cpu_count())
-    method = sys.argv[4] if len(sys.argv) > 4 else 'k'
-    chunk_size = int(sys.argv[5]) if len(sys.argv) > 5 else 50000
+    input_file = args.input_file
+    output_base = args.output_base
+    max_processes = args.max_processes
+    method = args.method
+    chunk_size = args.chunk_size
+    chunk_mb = args.chunk_mb if args.chunk_mb is not None else CHUNK_MB
     
     # Validate input file
     if not os.path.exists(input_file):
@@ -203,18 +331,20 @@ def main():
     print(f"Using {max_processes} processes")
     print(f"Processing method: {method}")
     
-    if method == 'k':
-        # Parallel processing by k-mer size (simpler, faster for moderate files)
-        process_by_k_parallel(input_file, output_base, max_processes)
-    elif method == 'chunk':
-        # Parallel processing by chunks (more memory efficient)
-        process_by_chunks_parallel(input_file, output_base, chunk_size, max_processes)
-    else:
-        print("Error: Method must be 'k' or 'chunk'")
-        sys.exit(1)
+    if method == 'chunk':
+        # Parallel processing by chunks, one pass over the input for all k
+        try:
+            process_by_chunks_parallel(input_file, output_base, chunk_size, max_processes, seed=args.seed,
+                                       chunk_mb=chunk_mb)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    elif method == 'k':
+        # Parallel processing by k-mer size, one pass over the input per k
+        process_by_k_parallel(input_file, output_base, max_processes, args.seed)
     
     print(f"\nDone! Created 35 files with k-mer sizes 1-35")
-    print(f"Output files: {output_base}_k1.fastq to {output_base}_k35.fastq")
+    print(f"Output files: {output_path(output_base, 1)} to {output_path(output_base, 35)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,13 +1,39 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import os
 import sys
-import gzip
 import random
-import shutil
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from pathlib import Path
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from fastx_io import BGZF_BLOCK_SIZE, BGZF_EOF, compress_bgzf_block, fastq_blocks, split_fastq_block
+except ImportError:
+    # Running from a checkout without fastx_io installed: use the copy in the repository
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "fastx_io"))
+    from fastx_io import BGZF_BLOCK_SIZE, BGZF_EOF, compress_bgzf_block, fastq_blocks, split_fastq_block
+
+try:
+    import numpy as np
+    from kmer_shuffle import shuffle_kmers
+except ImportError:
+    np = None  # Without NumPy, reads are shuffled one at a time with shuffle_sequence
+
+from chunk_checkpoint import ChunkCheckpoint, file_identity
+
+# A BGZF block never takes more than 64 KB, even for incompressible data
+MAX_BGZF_BLOCK = 1 << 16
+
+# Chunks are cut by size rather than read count, so workers get even loads however
+# much read lengths vary, as they do in merged pairs
+CHUNK_BYTES = 64 << 20
 
 def shuffle_sequence(sequence,n):
     kmers = [sequence[i:i+n] for i in range(0, len(sequence) - len(sequence) % n, n)]
@@ -17,55 +43,216 @@ def shuffle_sequence(sequence,n):
     # Shuffle the 2-mers
     random.shuffle(kmers)
     # Reassemble sequence from shuffled 2-mers and remainder
-    randomized_sequence = ''.join(kmers)
+    randomized_sequence = b''.join(kmers)
     return randomized_sequence
 
-def process_chunk(chunk,n):
-    output = []
-    for i in range(0, len(chunk), 4):
-        header = chunk[i]
-        sequence = chunk[i+1]
-        plus_line = chunk[i+2]
-        quality = chunk[i+3]
+def process_chunk(input_name, input_size, output_name, n, compression_level=6, seed=None, first_read=0):
+    """Shuffle the FASTQ reads in one shared memory block into BGZF blocks in another.
 
-        randomized_sequence= shuffle_sequence(sequence.strip(),n)
-        output.extend([header, randomized_sequence + '\n', f'+ shuffled {n}-mers\n', quality])
-    return output
+    Only the shared memory names and sizes pass between processes; the return value is
+    the number of compressed bytes written to the output block. With a seed, each read's
+    shuffle is keyed by its number in the file (first_read is the chunk's first read).
+    """
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        plus_line = f'+ shuffled {n}-mers'.encode()
+        records = split_fastq_block(bytes(input_shm.buf[:input_size]))
+        sequences = [sequence.strip() for _, sequence, _, _ in records]
+        if seed is not None:
+            randomized_sequences = shuffle_kmers(sequences, n, seed=seed, first_read=first_read)
+        elif np is not None:
+            # One vectorised shuffle per read length instead of one Python shuffle per read
+            randomized_sequences = shuffle_kmers(sequences, n, np.random.default_rng())
+        else:
+            randomized_sequences = [shuffle_sequence(sequence, n) for sequence in sequences]
+        shuffled = memoryview(b''.join(b"%s\n%s\n%s\n%s\n" % (header, randomized_sequence, plus_line, quality)
+                                       for (header, _, _, quality), randomized_sequence
+                                       in zip(records, randomized_sequences)))
 
-def randomize_fastq_sequences(input_file, output_file,mer_l, chunk_size=1000000):
-    num_cpus = int(os.getenv('SLURM_CPUS_ON_NODE', os.cpu_count()))
-    print(num_cpus)
-    with open_fastq_file(input_file) as infile, open(output_file, 'w') as outfile:
-        with ProcessPoolExecutor(max_workers=num_cpus) as executor:
-            futures = []
+        # Compress straight into the output block, where the writer will read it from
+        offset = 0
+        for i in range(0, len(shuffled), BGZF_BLOCK_SIZE):
+            block = compress_bgzf_block(shuffled[i:i + BGZF_BLOCK_SIZE], compression_level)
+            output_shm.buf[offset:offset + len(block)] = block
+            offset += len(block)
+        return offset
+    finally:
+        input_shm.close()
+        output_shm.close()
+
+def skip_reads(blocks, reads, expected_bytes):
+    """Drop the first reads records from a stream of FASTQ blocks, checking they took expected_bytes."""
+    skipped_bytes = 0
+    for block in blocks:
+        if reads:
+            cut = 0
+            block_reads = block.count(b'\n') // 4
+            if block_reads <= reads:
+                cut = len(block)
+                reads -= block_reads
+            else:
+                for _ in range(4 * reads):
+                    cut = block.find(b'\n', cut) + 1
+                reads = 0
+            skipped_bytes += cut
+            block = block[cut:]
+            if not reads and skipped_bytes != expected_bytes:
+                raise ValueError(f"The reads already done took {skipped_bytes} bytes of input, "
+                                 f"not {expected_bytes} as recorded: has the input changed?")
+        if block:
+            yield block
+    if reads:
+        raise ValueError("The input has fewer reads than were already done: has it changed?")
+
+def read_fastq_chunks(input_file, chunk_bytes=CHUNK_BYTES, skip=0, skip_bytes=0):
+    """Yield lists of FASTQ byte blocks of about chunk_bytes each, after the first skip reads."""
+    chunk = []
+    chunk_size = 0
+    blocks = fastq_blocks(input_file)
+    if skip:
+        blocks = skip_reads(blocks, skip, skip_bytes)
+    for block in blocks:
+        chunk.append(block)
+        chunk_size += len(block)
+        if chunk_size >= chunk_bytes:
+            yield chunk
             chunk = []
+            chunk_size = 0
+    if chunk:
+        yield chunk
+
+def share_chunk(chunk, n):
+    """Copy a chunk's FASTQ blocks into a new shared memory block, and create one for its output.
+
+    Returns (input block, input size, output block, reads). The output block is sized for the
+    worst case: every plus line replaced and the data not compressing at all.
+    """
+    input_size = sum(len(block) for block in chunk)
+    reads = sum(block.count(b'\n') for block in chunk) // 4
+    output_size = input_size + reads * len(f'+ shuffled {n}-mers')
+    blocks = -(-output_size // BGZF_BLOCK_SIZE)
 
-            for line in infile:
-                chunk.append(line)
-                if len(chunk) >= chunk_size * 4:
-                    futures.append(executor.submit(process_chunk, chunk,mer_l))
-                    chunk = []
+    input_shm = shared_memory.SharedMemory(create=True, size=max(input_size, 1))
+    try:
+        offset = 0
+        for block in chunk:
+            input_shm.buf[offset:offset + len(block)] = block
+            offset += len(block)
+        output_shm = shared_memory.SharedMemory(create=True, size=max(blocks * MAX_BGZF_BLOCK, 1))
+    except BaseException:
+        release(input_shm)
+        raise
+    return input_shm, input_size, output_shm, reads
 
-            if chunk:
-                futures.append(executor.submit(process_chunk, chunk,mer_l))
+def release(*shms):
+    """Close and remove shared memory blocks."""
+    for shm in shms:
+        shm.close()
+        shm.unlink()
+
+def collect(future, input_shm, input_size, output_shm, reads):
+    """Yield a finished chunk's (compressed output, reads, input bytes), then free the chunk's blocks.
+
+    The blocks are freed however this ends: written, failed in the worker, or abandoned
+    by the caller.
+    """
+    try:
+        compressed = output_shm.buf[:future.result()]
+        try:
+            yield compressed, reads, input_size
+        finally:
+            compressed.release()
+    finally:
+        release(input_shm, output_shm)
 
-            for future in as_completed(futures):
-                outfile.writelines(future.result())
+def exit_with_parent(parent_pid):
+    """Pool initializer: end the worker if the main process dies without shutting the pool down.
 
+    An orphaned worker would otherwise wait for tasks forever, keeping the resource
+    tracker alive, so the shared memory blocks of a killed run were never unlinked.
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(1)
+    threading.Thread(target=watch, daemon=True).start()
+
+def shuffle_chunks(chunks, n, num_cpus, compression_level=6, seed=None, first_read=0):
+    """Shuffle and compress chunks on a pool of num_cpus workers, yielding the results in input order.
+
+    Chunks travel to and from the workers in shared memory, so only names and sizes are
+    pickled. Each result is (compressed, reads, input bytes), where compressed is a
+    memoryview of a worker's output block, valid until the next one is requested.
+    Every block is unlinked once its chunk is written, or in a finally if the run fails
+    or is interrupted. If the process is killed outright, its workers exit and the
+    multiprocessing resource tracker unlinks what is left.
+    first_read is the number of the first read, if the chunks don't start the file.
+    Only num_cpus chunks are in flight at once, so with the chunk being read and the
+    one being written, memory holds about num_cpus + 2 chunks however large the input is.
+    """
+    with ProcessPoolExecutor(max_workers=num_cpus, initializer=exit_with_parent,
+                             initargs=(os.getpid(),)) as executor:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                input_shm, input_size, output_shm, reads = share_chunk(chunk, n)
+                try:
+                    future = executor.submit(process_chunk, input_shm.name, input_size, output_shm.name, n,
+                                             compression_level, seed, first_read)
+                except BaseException:
+                    release(input_shm, output_shm)
+                    raise
+                pending.append((future, input_shm, input_size, output_shm, reads))
+                first_read += reads
+                if len(pending) >= num_cpus:
+                    yield from collect(*pending.popleft())
+            while pending:
+                yield from collect(*pending.popleft())
+        finally:
+            # Only left over if something failed: free the blocks of chunks never written
+            for future, input_shm, _, output_shm, _ in pending:
+                future.cancel()
+                release(input_shm, output_shm)
+
+def randomize_fastq_sequences(input_file, output_file,mer_l, chunk_bytes=CHUNK_BYTES, compression_level=6, seed=None):
+    """Write the shuffled reads of input_file to output_file as gzip (BGZF), in one pass.
+
+    Each worker compresses its own chunk, so compression scales with the pool and the
+    writer only appends blocks; no uncompressed copy of the output is ever written.
+    With a seed (which needs NumPy) the output is the same for any chunk_bytes or number
+    of workers.
+
+    Every chunk is committed to a manifest (output_file + '.manifest') once it is on disk,
+    so if the job is killed, running it again with the same arguments keeps the chunks
+    already written and carries on from there; with a seed, the result is the same as
+    an uninterrupted run. The manifest is deleted once the output is finished.
+    """
+    num_cpus = int(os.getenv('SLURM_CPUS_ON_NODE', os.cpu_count()))
+    settings = {'input': file_identity(input_file), 'nmer': mer_l,
+                'compression_level': compression_level, 'chunk_bytes': chunk_bytes, 'seed': seed}
+    with ChunkCheckpoint([output_file], settings) as checkpoint:
+        if checkpoint.reads:
+            print(f"Resuming after {checkpoint.reads:,} reads ({checkpoint.chunks} chunks) already written")
+        chunks = read_fastq_chunks(input_file, chunk_bytes, checkpoint.reads, checkpoint.input_offset)
+        for compressed, reads, input_size in shuffle_chunks(chunks, mer_l, num_cpus, compression_level,
+                                                            seed, checkpoint.reads):
+            checkpoint.commit([compressed], reads, input_size)
+        checkpoint.finish(BGZF_EOF)
 
-def open_fastq_file(filename):
-    """Open FASTQ file, handling both regular and gzipped files."""
-    if filename.endswith('.gz'):
-        return gzip.open(filename, 'rt')  # 'rt' for read text mode
-    else:
-        return open(filename, 'r')
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python script.py <input_file> [output_directory] [nmer]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Shuffle the k-mers of every read in a FASTQ file")
+    parser.add_argument("input_file", help="Input FASTQ file (.fastq, .fq, .fastq.gz or .fq.gz)")
+    parser.add_argument("output_dir", nargs="?", default=os.getcwd(),
+                        help="Output directory (default: current directory)")
+    parser.add_argument("nmer", nargs="?", type=int, default=1, help="K-mer size to shuffle (default: 1)")
+    parser.add_argument("--seed", type=int,
+                        help="Random seed. Each read's shuffle is derived from the seed and its position "
+                             "in the file, so the output is the same however many CPUs are used")
+    args = parser.parse_args()
 
-    input_file = sys.argv[1]
+    input_file = args.input_file
 
     # Check if input file exists
     if not os.path.exists(input_file):
@@ -78,17 +265,11 @@ def main():
         print("Error: Input file must be a FASTQ file (.fastq, .fq, .fastq.gz, or .fq.gz extension)")
         sys.exit(1)
 
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.getcwd()
+    if args.seed is not None and np is None:
+        parser.error("--seed requires NumPy to be installed")
 
-    # Handle nmer argument with error checking
-    if len(sys.argv) > 3:
-        try:
-            nmer = int(sys.argv[3])
-        except ValueError:
-            print("Error: nmer must be an integer")
-            sys.exit(1)
-    else:
-        nmer = 1
+    output_dir = args.output_dir
+    nmer = args.nmer
 
     # Make sure output directory exists
     os.makedirs(output_dir, exist_ok=True)
@@ -98,19 +279,14 @@ def main():
     base_name, extension = os.path.splitext(input_filename)
 
     output_filename = f"{base_name}_shuffle_{nmer}mer{extension}"
-    output_file = os.path.join(output_dir, output_filename)
+    gzipped_output = os.path.join(output_dir, output_filename + '.gz')
 
-    # Call the randomization function
-    randomize_fastq_sequences(input_file, output_file, mer_l=nmer)
-
-    # Gzip the output file
-    gzipped_output = output_file + '.gz'
-    with open(output_file, 'rb') as f_in:
-        with gzip.open(gzipped_output, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
-
-    # Remove the uncompressed file
-    os.remove(output_file)
+    # Call the randomization function, which writes compressed output directly
+    try:
+        randomize_fastq_sequences(input_file, gzipped_output, mer_l=nmer, seed=args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
     print(f"Output written to: {gzipped_output}")
 